@@ -0,0 +1,167 @@
+# helpers for shrinking what gets sent to the browser when a dataset gets big
+# plotly's histogram and violin traces ship every raw row to the browser and let plotly.js do the math there
+# above AGGREGATE_ROWS rows we do that math here instead and send only the summary:
+# counts per bar for histograms, and an evenly spaced quantile sketch for violins (same shape, far fewer points)
+import os
+
+import numpy as np
+import pandas as pd
+
+# datasets with more rows than this get aggregated on the server (set AGGREGATE_ROWS=0 to always aggregate)
+AGGREGATE_ROWS = int(os.environ.get("AGGREGATE_ROWS", 5000))
+# how many points each violin is reduced to
+VIOLIN_QUANTILES = 256
+
+
+def should_aggregate(df):
+    """
+    True if a DataFrame is big enough that its figures should be built from aggregates
+    """
+    return len(df) > AGGREGATE_ROWS
+
+
+def count_table(df, x, color=None, frame=None):
+    """
+    Count rows per x (and color / animation frame) value - what px.histogram(histfunc='count') would draw
+    """
+    keys = [key for key in [frame, x, color] if key is not None]
+    return df.groupby(keys, observed=True, sort=False).size().reset_index(name="count")
+
+
+def binned_table(df, x, y=None, histfunc="count", color=None, frame=None, nbins=None):
+    """
+    Bin a numeric x column and count (or average y) per bin - for histograms of continuous values
+    """
+    edges = np.histogram_bin_edges(df[x].dropna(), bins=nbins or "auto")
+    centers = (edges[:-1] + edges[1:]) / 2
+    bins = pd.cut(df[x], edges, include_lowest=True, labels=centers)
+    keys = [key for key in [frame, color] if key is not None]
+    grouped = df.groupby(keys + [bins], observed=True, sort=False)
+    if histfunc == "avg":
+        table = grouped[y].mean().reset_index(name=y)
+    else:
+        table = grouped.size().reset_index(name="count")
+    table[x] = table[x].astype(float)
+    return table, edges[1] - edges[0]
+
+
+def violin_points(x, y, quantiles=VIOLIN_QUANTILES):
+    """
+    The x/y arrays for a go.Violin, reduced to a quantile sketch per x value when there are too many rows
+    """
+    if len(y) <= AGGREGATE_ROWS:
+        return x, y
+    xs, ys = [], []
+    probs = np.linspace(0, 1, quantiles)
+    for key, group in y.groupby(x, observed=True, sort=False):
+        # the quantiles include the min and max, so the whiskers and the violin outline stay put
+        ys.append(np.quantile(group.to_numpy(), probs))
+        xs.append(np.repeat(key, quantiles))
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+# past LARGE_DATA_ROWS even the summaries above aren't enough, so the point-based panels get rasterized:
+# points are binned into a fixed-size grid on the server, so the browser draws the same number of markers
+# whether the survey has a thousand answers or a million
+LARGE_DATA_ROWS = int(os.environ.get("LARGE_DATA_ROWS", 100_000))
+# how many cells each side of the ternary grid has
+TERNARY_GRID = 40
+
+
+def is_large(df):
+    """
+    True if a DataFrame is big enough that its point-based panels should be rasterized
+    """
+    return len(df) > LARGE_DATA_ROWS
+
+
+def hist2d_table(df, x, y, nbinsx, nbinsy, facets=()):
+    """
+    2D histogram counts per facet with numpy, plus the bin settings to draw them with
+    """
+    xedges = np.linspace(df[x].min(), df[x].max(), nbinsx + 1)
+    yedges = np.linspace(df[y].min(), df[y].max(), nbinsy + 1)
+    tables = []
+    for key, group in df.groupby(list(facets), observed=True, sort=False) if facets else [((), df)]:
+        counts, _, _ = np.histogram2d(group[x], group[y], bins=[xedges, yedges])
+        ix, iy = np.nonzero(counts)
+        table = pd.DataFrame({x: (xedges[ix] + xedges[ix + 1]) / 2, y: (yedges[iy] + yedges[iy + 1]) / 2,
+                              "count": counts[ix, iy]})
+        for facet, value in zip(facets, key if isinstance(key, tuple) else (key,)):
+            table[facet] = value
+        tables.append(table)
+    xbins = dict(start=xedges[0], end=xedges[-1], size=xedges[1] - xedges[0])
+    ybins = dict(start=yedges[0], end=yedges[-1], size=yedges[1] - yedges[0])
+    return pd.concat(tables, ignore_index=True), xbins, ybins
+
+
+def ternary_table(df, a, b, c, size, color=None, frame=None, grid=TERNARY_GRID):
+    """
+    Snap ternary points onto a fixed grid and merge each cell into one marker (mean size, with a count)
+    """
+    total = df[a] + df[b] + df[c]
+    keep = total > 0  # plotly can't place a point where all three are zero either
+    fa = (df[a][keep] / total[keep] * grid).round().astype(int)
+    fb = (df[b][keep] / total[keep] * grid).round().astype(int)
+    keys = [key for key in [frame, color] if key is not None]
+    cells = df[keys][keep].assign(_a=fa, _b=fb, _size=df[size][keep])
+    table = cells.groupby(keys + ["_a", "_b"], observed=True, sort=False)["_size"].agg(["mean", "size"])
+    table = table.reset_index().rename(columns={"mean": size, "size": "count"})
+    table[a] = table.pop("_a") / grid
+    table[b] = table.pop("_b") / grid
+    table[c] = (1 - table[a] - table[b]).clip(lower=0)
+    return table
+
+
+# treemaps and sunbursts
+# px.treemap/px.sunburst take raw rows and a path, then check and roll up the whole hierarchy in python every time,
+# which gets very slow on big datasets. hierarchy_table does the roll up with a couple of groupbys instead,
+# and the figures are drawn from its ids/parents/values with go.Treemap and go.Sunburst
+def hierarchy_table(df, path, values, color=None, hover=(), root=None):
+    """
+    One row per box of a treemap/sunburst: id, parent, label, value (summed) and color (averaged, weighted by value)
+    path goes from the outermost level in, root adds a single box around everything (like px.Constant)
+    hover columns keep their value where every row below a box agrees, and show "(?)" where they don't
+    """
+    frame = pd.DataFrame({name: df[name].astype(str).to_numpy() for name in path})
+    frame["value"] = df[values].to_numpy()
+    if color is not None:
+        frame["weighted"] = df[color].to_numpy() * frame["value"]
+    for name in hover:
+        frame[name] = df[name].to_numpy()
+    sums = ["value"] + (["weighted"] if color is not None else [])
+
+    def roll_up(table, keys):
+        # sum the numbers and collapse the hover columns one level up
+        named = {name: (name, "sum") for name in sums}
+        for name in hover:
+            named[name] = (name, "first")
+            named[name + " unique"] = (name, "nunique")
+        rolled = table.groupby(keys, sort=False, observed=True).agg(**named).reset_index()
+        for name in hover:
+            mixed = (rolled.pop(name + " unique") > 1) | (rolled[name].astype(str) == "(?)")
+            rolled[name] = rolled[name].where(~mixed, "(?)")
+        return rolled
+
+    levels = []
+    table = frame
+    for depth in range(len(path), 0, -1):
+        keys = list(path[:depth])
+        table = roll_up(table, keys)
+        # ids are the whole path joined with slashes, so two countries with the same name never collide
+        prefix = [pd.Series(root, index=table.index)] if root is not None else []
+        parts = prefix + [table[key] for key in keys]
+        ids, parents = parts[0], pd.Series("", index=table.index)
+        for part in parts[1:]:
+            parents, ids = ids, ids + "/" + part
+        levels.append(table.assign(id=ids, parent=parents, label=table[keys[-1]]))
+    if root is not None:
+        top = roll_up(levels[-1].assign(root=root), ["root"])
+        levels.append(top.assign(id=root, parent="", label=root))
+
+    boxes = pd.concat(levels[::-1], ignore_index=True)
+    if color is not None:
+        # a box with nothing in it has no weighted average, plotly leaves those grey
+        with np.errstate(invalid="ignore", divide="ignore"):
+            boxes["color"] = boxes["weighted"] / boxes["value"]
+    return boxes[["id", "parent", "label", "value"] + (["color"] if color is not None else []) + list(hover)]
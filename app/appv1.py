@@ -10,25 +10,54 @@
 # I hope you can gain some inspiration for it with your project / data / interests! <3
 
 # Import libraries
+import os
 import dash as dash
 from dash import dcc
 from dash import html
 from dash import ctx
-from textwrap import dedent
-import plotly.graph_objects as go
-from dash.dependencies import Input, Output
-
-import numpy as np
-import pandas as pd
-import plotly.express as px
+from dash import Patch
+from dash.exceptions import PreventUpdate
+from dash.dependencies import Input, Output, State, ClientsideFunction
+
+import flask
+from plotly.io.json import to_json_plotly
+
+import crossfilter
+import data_watch
+import frames
+import http_cache
+import metrics
+import panels
+import sessions
+import startup
+from figures import (FIGURE_BUILDERS, PANELS, data_version, get_figure_update, get_figures, get_full_figure,
+                     warm_up, whd_year_datasets)
 
 # Figure Templates
 bgcolor = "#f3f3f1"  # mapbox light map land color
 row_heights = [150, 500, 300]
 template = {"layout": {"paper_bgcolor": bgcolor, "plot_bgcolor": bgcolor}}
 
+# how the dataset buttons swap figures:
+# "clientside" - the browser keeps every dataset it has loaded in a dcc.Store and swaps figures itself,
+#                so the server only gets asked once per dataset (the JavaScript lives in assets/clientside.js)
+# "panels" - every graph has its own callback and is only built once it scrolls into view,
+#            so the panels load independently (and in parallel when running under gunicorn)
+# "server" - every click goes to update_graphs on the server, like a normal Dash callback
+DATASET_SWITCHING = os.environ.get("DATASET_SWITCHING", "clientside")
+
 # Required line to run the app
 app = dash.Dash(__name__)
+# this is the Flask server underneath Dash, production servers like gunicorn run this (see wsgi.py)
+server = app.server
+# callback timings, figure sizes and the like are available at /metrics (see metrics.py)
+metrics.instrument(server)
+# compression, ETags and long-lived caching of the assets (see http_cache.py)
+http_cache.install(app)
+# animation frames of the all-years figures are fetched separately by the browser (see frames.py)
+frames.register(server, get_full_figure, FIGURE_BUILDERS, PANELS, data_version)
+# /ready says when the data and figures are loaded, for health checks (see startup.py)
+startup.register(server)
 
 # this is a template modal that makes the info help text work
 # edit at your own risk!
@@ -47,7 +76,7 @@ def build_modal_info_overlay(id, side, content):
                                     "About this plot",
                                     html.Img(
                                         id=f"close-{id}-modal",
-                                        src="assets/times-circle-solid.svg",
+                                        src=http_cache.asset_url(app, "times-circle-solid.svg"),
                                         n_clicks=0,
                                         className="info-icon",
                                         style={"margin": 0},
@@ -71,84 +100,81 @@ def build_modal_info_overlay(id, side, content):
     return div
 
 
-# import all data for figures below
-# this is from the starting dataset
-musicdf = pd.read_csv("assets/mxmh_survey_results.csv")
-# this is from the datasets that'll be added later
-whddf = pd.read_csv("assets/WHD.csv")
-whd15df = whddf.set_index('Country').query("Year==2015")
-whd15df = whd15df.drop(columns=['Year'])
-whd15df["Happiness Ratio"] = 1/whd15df["Happiness Rank"]
-whd19df = whddf.set_index('Country').query("Year==2019")
-whd19df = whd19df.drop(columns=['Year'])
-whd19df["Happiness Ratio"] = 1/whd19df["Happiness Rank"]
-
-# add all constants and code associated with data churning below
-musicdf = musicdf.drop(columns=['Timestamp', 'Permissions'])
-# you can decide how to handle missing data per column
-# for example, with age you might want to impute a value based on the mean
-musicdf["Age"] = musicdf["Age"].fillna(value=round(musicdf.Age.mean()))
-# for something like music effects, you might want to assume no effect since it was not reported
-musicdf["Music effects"] = musicdf["Music effects"].fillna(value="No effect")
-musicdf["While working"] = musicdf["While working"].fillna(value="No")
-musicdf["Instrumentalist"] = musicdf["Instrumentalist"].fillna(value="No")
-musicdf["Composer"] = musicdf["Composer"].fillna(value="No")
-musicdf["Primary streaming service"] = musicdf["Primary streaming service"].fillna(value="I do not use a streaming service.")
-# feel free to impute missing values however you wish for your data
-# you can also make new values
-musicdf["Mental health severity"] = musicdf["Anxiety"] + musicdf["Depression"] + musicdf["Insomnia"] + musicdf["OCD"]
-# data churning is done!!!
-
-# time to create figures
-
-# by default, we will initialize the music / mental health data set
-# if you want to change the figures that load on start-up, edit these figures below
-# Please be *very* careful with changing the names of these figures, as they are referenced multiple times in the code
-# if you change any of the IDs above, you need to change where they are referenced below
-# change figure names at your own risk
-mainFig = go.Figure()
-mainFig.add_trace(go.Violin(x=musicdf['Music effects'][musicdf['Music effects'] != 'No effect'],
-                                y=musicdf['Depression'][musicdf['Music effects'] != 'No effect'],
-                                legendgroup='Depression/10', scalegroup='Depression/10', name='Depression/10',
-                                line_color='hotpink', box_visible=True)
-                      )
-mainFig.add_trace(go.Violin(x=musicdf['Music effects'][musicdf['Music effects'] != 'No effect'],
-                                y=musicdf['Anxiety'][musicdf['Music effects'] != 'No effect'],
-                                legendgroup='Anxiety/10', scalegroup='Anxiety/10', name='Anxiety/10',
-                                line_color='green', box_visible=True)
-                      )
-mainFig.add_trace(go.Violin(x=musicdf['Music effects'][musicdf['Music effects'] != 'No effect'],
-                                y=musicdf['OCD'][musicdf['Music effects'] != 'No effect'],
-                                legendgroup='OCD/10', scalegroup='OCD/10', name='OCD/10',
-                                line_color='blue', box_visible=True)
-                      )
-mainFig.add_trace(go.Violin(x=musicdf['Music effects'][musicdf['Music effects'] != 'No effect'],
-                                y=musicdf['Insomnia'][musicdf['Music effects'] != 'No effect'],
-                                legendgroup='Insomnia/10', scalegroup='Insomnia/10', name='Insomnia/10',
-                                line_color='purple', box_visible=True)
-                      )
-mainFig.update_traces(meanline_visible=True)
-mainFig.update_layout(violingap=0, violinmode='group')
-mainFig.update_layout(yaxis_title="Self-Ranked Score Out of 10",
-                          xaxis_title="Music Tends to ______ My Mental Health")
-
-histoFig = px.histogram(musicdf, x="Fav genre", histfunc='count', color="Music effects",
-                            color_discrete_sequence=px.colors.qualitative.Prism)
-histoFig.update_layout(yaxis_title="Number of People")
-
-denseFig = px.density_heatmap(musicdf, x="Depression", y="Anxiety", nbinsx=10, nbinsy=10, facet_row="Composer",
-                                  facet_col="Instrumentalist")
-
-scatterFig = px.scatter_ternary(musicdf, a="OCD", b="Anxiety", c="Insomnia", color="Exploratory",
-                                    size="Mental health severity", size_max=20,
-                                    color_discrete_sequence=px.colors.qualitative.Prism)
-
-pieFig = px.sunburst(musicdf, path=['Primary streaming service', 'Exploratory'], values='Hours per day',
-                         color='Primary streaming service', color_discrete_sequence=px.colors.sequential.Plasma)
+# how many panels fit side by side -> how wide each one is
+COLUMN_WIDTHS = {1: "twelve", 2: "six", 3: "four", 4: "three"}
+
+
+def build_panel(panel, columns):
+    """
+    Build the div for one panel: its title, the icon that opens its info modal, and its graph
+    """
+    graph = dcc.Graph(id=f"{panel.id}-graph", **({} if panel.modebar else {"config": {"displayModeBar": False}}))
+    if panel.height:
+        graph = dcc.Loading(graph, className="svg-container", style={"height": panel.height})
+    # a panel with a row to itself stretches all the way across
+    style = {"width": "98%", "margin-right": "0"} if columns == 1 else {}
+    return html.Div(
+        children=[
+            html.H4(
+                [
+                    panel.title,
+                    html.Img(
+                        id=f"show-{panel.id}-modal",
+                        src=http_cache.asset_url(app, "question-circle-solid.svg"),
+                        n_clicks=0,
+                        className="info-icon",
+                    ),
+                ],
+                className="container_title",
+            ),
+            graph,
+        ],
+        className=f"{COLUMN_WIDTHS[columns]} columns pretty_container",
+        style=style,
+        id=f"{panel.id}-div",
+    )
+
+
+def build_panel_row(row):
+    if len(row) == 1:
+        return build_panel(row[0], 1)
+    return html.Div(children=[build_panel(panel, len(row)) for panel in row])
+
+
+# the data is loaded (lazily!) in data.py - go there to change how the csv files are read and cleaned
+# every figure is built in figures.py - go there to change the plots
+# and the panels they go in are declared at the bottom of figures.py - go there to add a panel
+
+# the graphs start out empty, their figures come with restore_view (at the bottom) once the page has loaded,
+# so the layout stays small and doesn't need any data
+# by default, we will show the music / mental health data set
+# if you want to change the figures that load on start-up, change the dataset below
+START_DATASET = "mxmh"
+
+# in "panels" mode the browser keeps track of which panels are on screen, and which dataset each one is showing
+if DATASET_SWITCHING == "panels":
+    panel_tracking = [dcc.Interval(id="visibility-check", interval=500), dcc.Store(id="visible-panels", data=[])]
+    for panel in PANELS:
+        panel_tracking.append(dcc.Store(id=f"{panel}-request"))
+        panel_tracking.append(dcc.Store(id=f"{panel}-rendered"))
+else:
+    panel_tracking = []
 
 # this is what makes the web server look pretty
 app.layout = html.Div(
     children=[
+        # these hold the selected dataset and every dataset's figures once the browser has loaded them
+        dcc.Store(id="selected-dataset"),
+        dcc.Store(id="requested-dataset"),
+        dcc.Store(id="figure-store", data={}),
+        # one per graph, just so the animation frame streaming below has somewhere to write
+        *[dcc.Store(id=f"{panel}-frames") for panel in PANELS],
+        # the music survey cross-filters, and which of them each graph is showing (see crossfilter.py)
+        dcc.Store(id="crossfilter", data={}),
+        *[dcc.Store(id=f"{panel}-filter", data="") for panel in PANELS],
+        # the url says what's on screen, so the page can be reloaded or shared (see sessions.py)
+        dcc.Location(id="url", refresh=False),
+        *panel_tracking,
         html.Div(
             [ # title section with your logo can go here
                 html.H1(
@@ -156,7 +182,7 @@ app.layout = html.Div(
                         "Frontera Hacks A Dashboard",
                         html.A(
                             html.Img(
-                                src="assets/Kristen-Hallas.png",
+                                src=http_cache.asset_url(app, "Kristen-Hallas.png"),
                                 style={"float": "right", "height": "75px"},
                             ),
                             href="https://www.kristenhallas.com",
@@ -188,6 +214,9 @@ html.Div(
                 * callback function buttons that swap out datasets (but can do so much more - 
                 [definitely worth the research](https://dash.plotly.com/basic-callbacks)) 
                 * samples of some of the coolest Plotly plots available to you
+                * cross-filtering on the music survey: click a genre, a violin or a streaming service (or move 
+                the age slider) and the other plots only show those people
+                * the page's link always points at what you're looking at, so you can share it or come back to it
                 
                 Click the buttons to load sample data sets, explore the interactivity of the Plotly plots, and enjoy 
                 customizing this dashboard! 
@@ -222,9 +251,46 @@ html.Div(
                                             className="button",
                                             style={"padding-left": "10px", "padding-right": "10px",
                                                    "margin-left": "10px", "margin-right": "10px"}
-                                        )
+                                        ),
+                                        # any single year in WHD.csv, not just the two with buttons
+                                        # (year_options below fills it in when the page loads)
+                                        dcc.Dropdown(
+                                            id="whd-year",
+                                            options=[],
+                                            placeholder="Pick a year...",
+                                            clearable=False,
+                                            style={"width": "260px", "display": "inline-block",
+                                                   "vertical-align": "middle", "margin-left": "10px"}
+                                        ),
                             ],
                         ),
+                html.Div(
+                            children=[ # the music survey filters, clicking on the plots adds to them too
+                                        html.Span("Age", style={"margin-left": "10px"}),
+                                        html.Div(
+                                            dcc.RangeSlider(
+                                                id="age-range",
+                                                min=crossfilter.AGE_RANGE[0],
+                                                max=crossfilter.AGE_RANGE[1],
+                                                step=1,
+                                                value=crossfilter.AGE_RANGE,
+                                                marks={age: str(age) for age in range(0, 101, 10)},
+                                                tooltip={"placement": "bottom"},
+                                            ),
+                                            style={"width": "400px", "display": "inline-block",
+                                                   "vertical-align": "middle"}
+                                        ),
+                                        html.Button(
+                                            "Clear Filters",
+                                            id="clear-filters",
+                                            className="button",
+                                            style={"padding-left": "10px", "padding-right": "10px",
+                                                   "margin-left": "10px", "margin-right": "10px"}
+                                        ),
+                                        html.Span(id="crossfilter-summary"),
+                            ],
+                            style={"margin-top": "10px"},
+                        ),
                 ],
             style={
                 "width": "98%",
@@ -234,193 +300,9 @@ html.Div(
             className="twelve columns pretty_container",
         ),
         html.Div(
-            children=[ # this does the help text for each of the help modals
-                build_modal_info_overlay(
-                    "histo",
-                    "bottom",
-                    dedent(
-                        """
-            The _**Histogram example**_ panel displays an example of the Histogram plot. You can edit this panel to
-            contain information that is relevant to the plot you created. 
-            
-            [You can learn more about Histograms at this link](https://plotly.com/python/histograms/).
-            """
-                    ),
-                ),
-                build_modal_info_overlay(
-                    "dense",
-                    "bottom",
-                    dedent(
-                        """
-            The _**Density map example **_ panel displays an example of the Density map plot. You can edit this panel to
-            contain information that is relevant to the plot you created. 
-            
-            [You can learn more about Density Map plots at this link](https://plotly.com/python/2D-Histogram/).
-            """
-                    ),
-                ),
-                build_modal_info_overlay(
-                    "main",
-                    "bottom",
-                    dedent(
-                        """
-            The _**Main plot example **_ panel displays an example of a larger plot within the scheme of the app. 
-            You can edit this panel to contain information that is relevant to the plot you created. 
-            
-            [Plotly has all sorts of examples for plots, you can see all of them here.](https://plotly.com/python/plotly-express/).
-            """
-                    ),
-                ),
-                build_modal_info_overlay(
-                    "pie",
-                    "top",
-                    dedent(
-                        """
-            The _**Pie example **_ panel displays an example of a Pie plot. You can edit this panel to
-            contain information that is relevant to the plot you created. 
-            
-            [You can learn more about Pie plots at this link](https://plotly.com/python/sunburst-charts/).
-        """
-                    ),
-                ),
-                build_modal_info_overlay(
-                    "scatter",
-                    "top",
-                    dedent(
-                        """
-            The _**Scatter example **_ panel displays an example of a Scatter plot. You can edit this panel to
-            contain information that is relevant to the plot you created. 
-            
-            [You can learn more about Scatter plots at this link](https://plotly.com/python/line-and-scatter/).
-        """
-                    ),
-                ),
-                html.Div(
-                    children=[
-                        html.Div(
-                            children=[ # contains the top row charts
-                                html.H4(
-                                    [
-                                        "Histogram Example", # top left chart
-                                        html.Img(
-                                            id="show-histo-modal",
-                                            src="assets/question-circle-solid.svg",
-                                            n_clicks=0,
-                                            className="info-icon",
-                                        ),
-                                    ],
-                                    className="container_title",
-                                ),
-                                dcc.Loading(
-                                    dcc.Graph(
-                                        id="histo-graph",
-                                        figure=histoFig,
-                                        config={"displayModeBar": False},
-                                    ),
-                                    className="svg-container",
-                                    style={"height": 150},
-                                ),
-                            ],
-                            className="six columns pretty_container",
-                            id="histo-div",
-                        ),
-                        html.Div(
-                            children=[
-                                html.H4(
-                                    [
-                                        "Density Map Example", #top right chart
-                                        html.Img(
-                                            id="show-dense-modal",
-                                            src="assets/question-circle-solid.svg",
-                                            className="info-icon",
-                                        ),
-                                    ],
-                                    className="container_title",
-                                ),
-                                dcc.Graph(
-                                    id="dense-graph",
-                                    figure=denseFig,
-                                    config={"displayModeBar": False},
-                                ),
-                            ],
-                            className="six columns pretty_container",
-                            id="dense-div",
-                        ),
-                    ]
-                ),
-                html.Div(
-                    children=[ # this contains the main chart
-                        html.H4(
-                            [
-                                "Main Plot Example",
-                                html.Img(
-                                    id="show-main-modal",
-                                    src="assets/question-circle-solid.svg",
-                                    className="info-icon",
-                                ),
-                            ],
-                            className="container_title",
-                        ),
-                        dcc.Graph(
-                            id="main-graph",
-                            figure=mainFig,
-                        ),
-                    ],
-                    className="twelve columns pretty_container",
-                    style={
-                        "width": "98%",
-                        "margin-right": "0",
-                    },
-                    id="main-div",
-                ),
-                html.Div(
-                    children=[
-                        html.Div(
-                            children=[ # this contains the bottom row charts
-                                html.H4(
-                                    [
-                                        "Pie Example", # left plot
-                                        html.Img(
-                                            id="show-pie-modal",
-                                            src="assets/question-circle-solid.svg",
-                                            className="info-icon",
-                                        ),
-                                    ],
-                                    className="container_title",
-                                ),
-                                dcc.Graph(
-                                    id="pie-graph",
-                                    figure=pieFig,
-                                    config={"displayModeBar": False},
-                                ),
-                            ],
-                            className="six columns pretty_container",
-                            id="pie-div",
-                        ),
-                        html.Div(
-                            children=[
-                                html.H4(
-                                    [
-                                        "Scatter Example", # right plot
-                                        html.Img(
-                                            id="show-scatter-modal",
-                                            src="assets/question-circle-solid.svg",
-                                            className="info-icon",
-                                        ),
-                                    ],
-                                    className="container_title",
-                                ),
-                                dcc.Graph(
-                                    id="scatter-graph",
-                                    config={"displayModeBar": False},
-                                    figure=scatterFig,
-                                ),
-                            ],
-                            className="six columns pretty_container",
-                            id="scatter-div",
-                        ),
-                    ]
-                ),
+            children=[ # the help text for each of the help modals, then the panels themselves (see panels.py)
+                *[build_modal_info_overlay(panel.id, panel.modal_side, panel.info) for panel in panels.REGISTRY],
+                *[build_panel_row(row) for row in panels.rows()],
             ]
         ),
         html.Div(
@@ -462,13 +344,34 @@ This template was repurposed with love by Kristen Hallas, for the purpose of the
     ],
 )
 
+# the layout is the same for everyone and doesn't change while the app runs, so it's only turned into JSON once
+layout_json = None
+
+
+def serve_layout():
+    global layout_json
+    if layout_json is None:
+        layout_json = to_json_plotly(app._layout_value())
+    return flask.Response(layout_json, mimetype="application/json")
+
+
+server.view_functions[app.config.routes_pathname_prefix + "_dash-layout"] = serve_layout
+
 # callbacks
 # this is what makes the app interactive
 
 # first function create show/hide callbacks for each info modal
-# if you change any of the IDs above, you need to change them here
-# change at your own risk
-for id in ["histo", "dense", "main", "pie", "scatter"]:
+# they're made for every panel in panels.REGISTRY, so a new panel gets them too
+for id in PANELS:
+
+    if DATASET_SWITCHING != "server":
+        # showing a help box doesn't need python at all, so let the browser do it
+        app.clientside_callback(
+            ClientsideFunction(namespace="dashboard", function_name="toggle_modal"),
+            [Output(f"{id}-modal", "style"), Output(f"{id}-div", "style")],
+            [Input(f"show-{id}-modal", "n_clicks"), Input(f"close-{id}-modal", "n_clicks")],
+        )
+        continue
 
     @app.callback(
         [Output(f"{id}-modal", "style"), Output(f"{id}-div", "style")],
@@ -481,184 +384,239 @@ for id in ["histo", "dense", "main", "pie", "scatter"]:
         else:
             return {"display": "none"}, {"zIndex": 0}
 
-# create callback to show each graph. you can't do multiple callbacks that use the same output/input ID
-# so that's why we do it in a big function like this
-# if you need help understanding each of the graph plots I comment about them up at their initialization
-@app.callback([
-    Output("histo-graph", "figure"),
-    Output("dense-graph", "figure"),
-    Output("main-graph", "figure"),
-    Output("pie-graph", "figure"),
-    Output("scatter-graph", "figure")],
-    [Input("mxmh", "n_clicks"),
-     Input("whd15", "n_clicks"),
-     Input("whd19", "n_clicks"),
-     Input("whd", "n_clicks")], prevent_initial_call=True)
-
-# you need the number of input in update_graphs to match the number of buttons you have updating graphs
-def update_graphs(b1, b2, b3, b4):
-    triggered_id = ctx.triggered[0]['prop_id']
-    if 'mxmh.n_clicks' == triggered_id:
-        return update_mxmh()
-    elif 'whd15.n_clicks' == triggered_id:
-        return update_whd15()
-    elif 'whd19.n_clicks' == triggered_id:
-        return update_whd19()
-    else:
-        return update_whd()
-
-# the output should be returning the figures you wanted to update
-def update_mxmh():
-    mainFig = go.Figure()
-    mainFig.add_trace(go.Violin(x=musicdf['Music effects'][musicdf['Music effects'] != 'No effect'],
-                                y=musicdf['Depression'][musicdf['Music effects'] != 'No effect'],
-                                legendgroup='Depression/10', scalegroup='Depression/10', name='Depression/10',
-                                line_color='hotpink', box_visible=True)
-                      )
-    mainFig.add_trace(go.Violin(x=musicdf['Music effects'][musicdf['Music effects'] != 'No effect'],
-                                y=musicdf['Anxiety'][musicdf['Music effects'] != 'No effect'],
-                                legendgroup='Anxiety/10', scalegroup='Anxiety/10', name='Anxiety/10',
-                                line_color='green', box_visible=True)
-                      )
-    mainFig.add_trace(go.Violin(x=musicdf['Music effects'][musicdf['Music effects'] != 'No effect'],
-                                y=musicdf['OCD'][musicdf['Music effects'] != 'No effect'],
-                                legendgroup='OCD/10', scalegroup='OCD/10', name='OCD/10',
-                                line_color='blue', box_visible=True)
-                      )
-    mainFig.add_trace(go.Violin(x=musicdf['Music effects'][musicdf['Music effects'] != 'No effect'],
-                                y=musicdf['Insomnia'][musicdf['Music effects'] != 'No effect'],
-                                legendgroup='Insomnia/10', scalegroup='Insomnia/10', name='Insomnia/10',
-                                line_color='purple', box_visible=True)
-                      )
-    mainFig.update_traces(meanline_visible=True)
-    mainFig.update_layout(violingap=0, violinmode='group')
-    mainFig.update_layout(yaxis_title="Self-Ranked Score Out of 10",
-                          xaxis_title="Music Tends to ______ My Mental Health")
-
-    histoFig = px.histogram(musicdf, x="Fav genre", histfunc='count', color="Music effects",
-                            color_discrete_sequence=px.colors.qualitative.Prism)
-    histoFig.update_layout(yaxis_title="Number of People")
-
-    denseFig = px.density_heatmap(musicdf, x="Depression", y="Anxiety", nbinsx=10, nbinsy=10, facet_row="Composer",
-                                  facet_col="Instrumentalist")
-
-    scatterFig = px.scatter_ternary(musicdf, a="OCD", b="Anxiety", c="Insomnia", color="Exploratory",
-                                    size="Mental health severity", size_max=20,
-                                    color_discrete_sequence=px.colors.qualitative.Prism)
-
-    pieFig = px.sunburst(musicdf, path=['Primary streaming service', 'Exploratory'], values='Hours per day',
-                         color='Primary streaming service', color_discrete_sequence=px.colors.sequential.Plasma)
-    return histoFig, denseFig, mainFig, pieFig, scatterFig
-
-
-def update_whd15():
-    histoFig = px.histogram(whd15df, x="Happiness Score", y='Health (Life Expectancy)', histfunc='avg',
-                   color="Region", color_discrete_sequence=px.colors.sequential.Plasma)
-
-    tempdf = whd15df.where(whd15df["Happiness Score"] > 5)
-    scatterFig = px.scatter_3d(tempdf,
-                               x="Economy (GDP per Capita)", y="Trust (Government Corruption)", z="Freedom",
-                               color='Region', hover_name=whd15df.index,
-                               hover_data=['Economy (GDP per Capita)', 'Family',
-                                           'Health (Life Expectancy)', 'Freedom',
-                                           'Trust (Government Corruption)',
-                                           'Generosity'], color_discrete_sequence=px.colors.sequential.Plasma)
-
-    # draw the floor plan fig
-    mainFig = px.choropleth(whd15df, locations="iso_alpha",
-                    color="Happiness Score", fitbounds='locations',
-                    hover_name=whd15df.index, hover_data=['Economy (GDP per Capita)', 'Family',
-                                                      'Health (Life Expectancy)', 'Freedom',
-                                                      'Trust (Government Corruption)', 'Generosity'],
-                    color_continuous_scale=px.colors.sequential.RdBu)
-    mainFig.update_layout(margin=dict(l=0, r=0, t=0, b=0),
-                          legend=dict(orientation='h', y=-0.1, yanchor='bottom', x=0.5, xanchor='center'))
-
-    # draw the figure that counts instances of a component being the max consumer
-    denseFig = px.treemap(whd15df, path=[px.Constant("world"), 'Region', whd15df.index], values='Happiness Ratio',
-                  color='Happiness Score', hover_data=['Happiness Ratio'], color_continuous_scale='RdBu',
-                  color_continuous_midpoint=np.average(whd15df['Happiness Score'], weights=whd15df['Happiness Ratio'])
-                )
-    denseFig.update_layout(margin = dict(t=50, l=25, r=25, b=25))
-
-    # draw the figure that counts instances of a component being the hottest
-    pieFig = px.sunburst(whd15df, path=['Region', whd15df.index], values='Happiness Ratio',
-                  color='Happiness Score', hover_data=['Happiness Ratio'], color_continuous_scale='RdBu',
-                  color_continuous_midpoint=np.average(whd15df['Happiness Score'], weights=whd15df['Happiness Ratio']))
-    return histoFig, denseFig, mainFig, pieFig, scatterFig
-
-
-def update_whd19():
-    mainFig = px.choropleth(whd19df, locations="iso_alpha",
-                    color="Happiness Score", fitbounds='locations',
-                    hover_name=whd19df.index, hover_data=['Economy (GDP per Capita)', 'Family',
-                                                      'Health (Life Expectancy)', 'Freedom',
-                                                      'Trust (Government Corruption)', 'Generosity'],
-                    color_continuous_scale=px.colors.sequential.RdBu)
-    mainFig.update_layout(margin=dict(l=0, r=0, t=0, b=0),
-                          legend=dict(orientation='h', y=-0.1, yanchor='bottom', x=0.5, xanchor='center'))
-
-    histoFig = px.histogram(whd19df, x="Happiness Score", y='Health (Life Expectancy)', histfunc='avg',
-                   color="Region", color_discrete_sequence=px.colors.sequential.Plasma)
-
-    tempdf = whd19df.where(whd19df["Happiness Score"] > 5)
-    scatterFig = px.scatter_3d(tempdf,
-                        x="Economy (GDP per Capita)", y="Trust (Government Corruption)", z="Freedom",
-                        color='Region', hover_name=whd19df.index, hover_data=['Economy (GDP per Capita)', 'Family',
-                                                                              'Health (Life Expectancy)', 'Freedom',
-                                                                              'Trust (Government Corruption)',
-                                                                              'Generosity'],
-                               color_discrete_sequence=px.colors.sequential.Plasma)
-
-    denseFig = px.treemap(whd19df, path=[px.Constant("world"), 'Region', whd19df.index], values='Happiness Ratio',
-                  color='Happiness Score', hover_data=['Happiness Ratio'], color_continuous_scale='RdBu',
-                  color_continuous_midpoint=np.average(whd19df['Happiness Score'], weights=whd19df['Happiness Ratio'])
-                )
-    denseFig.update_layout(margin = dict(t=50, l=25, r=25, b=25))
-
-    pieFig = px.sunburst(whd19df, path=['Region', whd19df.index], values='Happiness Ratio',
-                  color='Happiness Score', hover_data=['Happiness Ratio'], color_continuous_scale='RdBu',
-                  color_continuous_midpoint=np.average(whd19df['Happiness Score'], weights=whd19df['Happiness Ratio']))
-    return histoFig, denseFig, mainFig, pieFig, scatterFig
-
-
-def update_whd():
-    mainFig = px.choropleth(whddf, locations="iso_alpha",
-                    color="Happiness Score", fitbounds='locations',
-                    hover_name="Country", hover_data=['Economy (GDP per Capita)', 'Family',
-                                                      'Health (Life Expectancy)', 'Freedom',
-                                                      'Trust (Government Corruption)', 'Generosity'],
-                    color_continuous_scale=px.colors.sequential.RdBu, animation_frame="Year")
-    mainFig.update_layout(margin=dict(l=0, r=0, t=0, b=0),
-                          legend=dict(orientation='h', y=-0.1, yanchor='bottom', x=0.5, xanchor='center'))
-
-    histoFig = px.histogram(whddf, x="Happiness Score", histfunc='count', color="Region",
-                   color_discrete_sequence=px.colors.sequential.Plasma,
-                   animation_frame="Year")
-    histoFig.update_layout(yaxis_title="Number of Countries")
-
-    scatterFig = px.scatter_ternary(whddf, a="Generosity", b="Trust (Government Corruption)", c="Freedom",
-                         hover_name="Country", color="Region", size="Happiness Score", size_max=15,
-                         hover_data=['Happiness Score', 'Economy (GDP per Capita)', 'Family',
-                                                      'Health (Life Expectancy)', 'Freedom',
-                                                      'Trust (Government Corruption)', 'Generosity'],
-                         animation_frame="Year", color_discrete_sequence=px.colors.sequential.Plasma)
-
-    denseFig = px.treemap(whddf, path=[px.Constant("world"), 'Region', 'Country'], values='Economy (GDP per Capita)',
-                  color='Happiness Score', hover_data=['Economy (GDP per Capita)'],
-                  color_continuous_scale='RdBu',
-                  color_continuous_midpoint=np.average(whddf['Happiness Score'], weights=whddf['Economy (GDP per Capita)']))
-    denseFig.update_layout(margin = dict(t=50, l=25, r=25, b=25))
-
-    pieFig = px.sunburst(whddf, path=['Region', 'Country'], values='Trust (Government Corruption)',
-                  color='Happiness Score', hover_data=['iso_alpha'],
-                  color_continuous_scale='RdBu',
-                  color_continuous_midpoint=np.average(whddf['Happiness Score'], weights=whddf['Trust (Government Corruption)']))
-
-    return histoFig, denseFig, mainFig, pieFig, scatterFig
+# the dataset buttons at the top of the page (the year dropdown can pick any other dataset)
+BUTTONS = ["mxmh", "whd15", "whd19", "whd"]
+
+GRAPH_OUTPUTS = [Output(f"{panel}-graph", "figure") for panel in PANELS]
+
+if DATASET_SWITCHING != "server":
+    # remember which button was clicked (in the browser)
+    app.clientside_callback(
+        ClientsideFunction(namespace="dashboard", function_name="select_dataset"),
+        Output("selected-dataset", "data"),
+        [Input(button, "n_clicks") for button in BUTTONS] + [Input("whd-year", "value")], prevent_initial_call=True)
+
+if DATASET_SWITCHING == "clientside":
+    # 1. the button click was saved to selected-dataset above
+    # 2. if the browser doesn't have that dataset's figures yet, ask the server for them (in the browser)
+    app.clientside_callback(
+        ClientsideFunction(namespace="dashboard", function_name="request_bundle"),
+        Output("requested-dataset", "data"),
+        Input("selected-dataset", "data"), State("figure-store", "data"), prevent_initial_call=True)
+
+    # 3. send one dataset's figures to the browser, only this step runs on the server
+    @app.callback(Output("figure-store", "data"), Input("requested-dataset", "data"), prevent_initial_call=True)
+    def load_bundle(dataset):
+        if dataset not in FIGURE_BUILDERS:
+            raise PreventUpdate
+        # Patch only sends the new dataset, not everything the browser already has
+        store = Patch()
+        store[dataset] = get_figures(dataset)
+        return store
+
+    # 4. show the selected dataset's figures once they're in the store (in the browser)
+    #    graphs showing cross-filters (like ones restored from the url) are left alone
+    app.clientside_callback(
+        ClientsideFunction(namespace="dashboard", function_name="show_dataset"),
+        GRAPH_OUTPUTS + [Output(f"{panel}-filter", "data", allow_duplicate=True) for panel in PANELS],
+        Input("selected-dataset", "data"), Input("figure-store", "data"),
+        [State(f"{panel}-filter", "data") for panel in PANELS], prevent_initial_call=True)
+
+elif DATASET_SWITCHING == "panels":
+    # every half a second the browser checks which panels are on screen
+    app.clientside_callback(
+        ClientsideFunction(namespace="dashboard", function_name="visible_panels"),
+        Output("visible-panels", "data"),
+        Input("visibility-check", "n_intervals"), State("visible-panels", "data"),
+        [State(f"{panel}-div", "id") for panel in PANELS])
+
+    for panel in PANELS:
+        # a panel asks for a new figure only when it's on screen and isn't already showing the selected dataset
+        # (the panel's div id is passed in so the same JavaScript function works for every panel)
+        app.clientside_callback(
+            ClientsideFunction(namespace="dashboard", function_name="request_panel"),
+            Output(f"{panel}-request", "data"),
+            Input("selected-dataset", "data"), Input("visible-panels", "data"),
+            State(f"{panel}-rendered", "data"), State(f"{panel}-div", "id"), prevent_initial_call=True)
+
+        # each panel is its own request, so the figures are built independently
+        @app.callback(Output(f"{panel}-graph", "figure"), Output(f"{panel}-rendered", "data"),
+                      Output(f"{panel}-filter", "data"),
+                      Input(f"{panel}-request", "data"), State(f"{panel}-rendered", "data"),
+                      State(f"{panel}-filter", "data"), State("crossfilter", "data"), prevent_initial_call=True)
+        def update_panel(dataset, rendered, filtered, filters, panel=panel):
+            if dataset not in FIGURE_BUILDERS:
+                raise PreventUpdate
+            wanted = crossfilter.panel_filters(filters or {}, panel) if dataset == "mxmh" else ()
+            if wanted:
+                # a view with filters on, restored from the url (see restore_view)
+                return crossfilter.get_figure(panel, wanted), dataset, crossfilter.filter_key(wanted)
+            # if the panel already shows a figure with the same traces, only the changes are sent
+            # (a cross-filtered figure isn't the one the server has cached, so that gets the whole figure)
+            return get_figure_update(dataset, panel, None if filtered else rendered), dataset, ""
+
+else:
+    # create callback to show each graph. you can't do multiple callbacks that use the same output/input ID
+    # so that's why we do it in a big function like this
+    # if you need help understanding each of the graph plots I comment about them up at their initialization
+    # selected-dataset remembers what's on screen, so switching between similar datasets only sends the changes
+    @app.callback(GRAPH_OUTPUTS + [Output("selected-dataset", "data")]
+                  + [Output(f"{panel}-filter", "data") for panel in PANELS],
+        [Input("mxmh", "n_clicks"),
+         Input("whd15", "n_clicks"),
+         Input("whd19", "n_clicks"),
+         Input("whd", "n_clicks"),
+         Input("whd-year", "value")], [State("selected-dataset", "data")]
+                  + [State(f"{panel}-filter", "data") for panel in PANELS], prevent_initial_call=True)
+
+    # you need the number of input in update_graphs to match the number of buttons you have updating graphs
+    def update_graphs(b1, b2, b3, b4, year_dataset, shown, *filtered):
+        triggered_id = ctx.triggered[0]['prop_id']
+        dataset = year_dataset if triggered_id == "whd-year.value" else triggered_id.split(".")[0]
+        if dataset not in FIGURE_BUILDERS:
+            dataset = "whd"
+        # the first click on a button builds its figures, every click after that is served from the cache
+        get_figures(dataset)
+        # cross-filtered graphs aren't showing the cached figure, so they get the whole new figure instead of changes
+        return ([get_figure_update(dataset, panel, None if was_filtered else shown)
+                 for panel, was_filtered in zip(PANELS, filtered)] + [dataset] + [""] * len(PANELS))
+
+# cross-filtering on the music survey: clicking on one panel filters the others (see crossfilter.py)
+# the graphs are also changed by the dataset switching above, hence allow_duplicate
+# {panel}-filter remembers which filters each graph is showing, so a graph is only sent again when they change
+@app.callback([Output(f"{panel}-graph", "figure", allow_duplicate=True) for panel in PANELS]
+              + [Output(f"{panel}-filter", "data", allow_duplicate=True) for panel in PANELS]
+              + [Output("crossfilter", "data"), Output("crossfilter-summary", "children")],
+              [Input(f"{panel}-graph", "clickData") for panel in crossfilter.PANEL_FILTERS] + [Input("age-range", "value")],
+              [State("crossfilter", "data"), State("selected-dataset", "data")]
+              + [State(f"{panel}-filter", "data") for panel in PANELS], prevent_initial_call=True)
+def cross_filter(*args):
+    # a click on each panel that filters, then the age slider, the filters, the dataset and what each graph shows
+    clicks = dict(zip(crossfilter.PANEL_FILTERS, args))
+    ages, filters, dataset, *showing = args[len(clicks):]
+    if dataset != "mxmh":
+        raise PreventUpdate
+    clicked = ctx.triggered_id.split("-")[0] if ctx.triggered_id != "age-range" else None
+    click_data = clicks.get(clicked)
+    filters = crossfilter.update_filters(filters, clicked, click_data, ages)
+    graphs, keys = [], []
+    for panel, shown_key in zip(PANELS, showing):
+        wanted = crossfilter.panel_filters(filters, panel)
+        key = crossfilter.filter_key(wanted)
+        if key == (shown_key or ""):
+            graphs.append(dash.no_update)
+            keys.append(dash.no_update)
+        else:
+            graphs.append(crossfilter.get_figure(panel, wanted))
+            keys.append(key)
+    return graphs + keys + [filters, crossfilter.summary(filters)]
+
+
+# switching datasets or clicking Clear Filters starts over (in the browser),
+# moving the age slider back then sends the unfiltered graphs through cross_filter above
+app.clientside_callback(
+    ClientsideFunction(namespace="dashboard", function_name="clear_filters"),
+    Output("crossfilter", "data", allow_duplicate=True), Output("age-range", "value"),
+    Output("crossfilter-summary", "children", allow_duplicate=True),
+    [Input(button, "n_clicks") for button in BUTTONS] + [Input("whd-year", "value"), Input("clear-filters", "n_clicks")],
+    State("age-range", "min"), State("age-range", "max"), prevent_initial_call=True)
+
+
+def view_figures(view):
+    """
+    Every panel's figure for a view, and the filters each one is showing (straight from the shared figure caches)
+    """
+    if not view["filters"]:
+        return list(get_figures(view["dataset"])), [""] * len(PANELS)
+    wanted = [crossfilter.panel_filters(view["filters"], panel) for panel in PANELS]
+    return ([crossfilter.get_figure(panel, filters) for panel, filters in zip(PANELS, wanted)],
+            [crossfilter.filter_key(filters) for filters in wanted])
+
+
+# opening the page (or going back and forward) shows the view in the url,
+# or without one in the url, the last view this browser's session was looking at
+# everything the dataset switching and cross-filtering set is set here too, hence all the allow_duplicate
+# (that's also how the graphs get their first figures, see START_DATASET)
+# in "panels" mode no figures are sent from here, the panels are marked as showing nothing yet
+# and each one asks for its figure once it's on screen, like after a dataset switch
+RENDERED_OUTPUTS = ([Output(f"{panel}-rendered", "data", allow_duplicate=True) for panel in PANELS]
+                    if DATASET_SWITCHING == "panels" else [])
+# in "clientside" mode unfiltered figures go in the browser's store instead, so they don't get asked for again
+STORE_OUTPUTS = [Output("figure-store", "data", allow_duplicate=True)] if DATASET_SWITCHING == "clientside" else []
+
+
+@app.callback([Output(f"{panel}-graph", "figure", allow_duplicate=True) for panel in PANELS]
+              + [Output(f"{panel}-filter", "data", allow_duplicate=True) for panel in PANELS]
+              + [Output("selected-dataset", "data", allow_duplicate=True),
+                 Output("crossfilter", "data", allow_duplicate=True),
+                 Output("age-range", "value", allow_duplicate=True),
+                 Output("crossfilter-summary", "children", allow_duplicate=True)] + RENDERED_OUTPUTS + STORE_OUTPUTS,
+              Input("url", "search"), State("selected-dataset", "data"), State("crossfilter", "data"),
+              prevent_initial_call="initial_duplicate")
+def restore_view(search, dataset, filters):
+    view = (sessions.view_from_query(search, FIGURE_BUILDERS)
+            or sessions.last_view(flask.request.cookies.get(sessions.SESSION_COOKIE)))
+    if view is None or view["dataset"] not in FIGURE_BUILDERS:
+        # nothing to go on, or the session was last looking at a year that's not in WHD.csv anymore
+        view = {"dataset": START_DATASET, "filters": {}}
+    if view == {"dataset": dataset, "filters": filters or {}}:
+        raise PreventUpdate
+    ages = view["filters"].get("Age", crossfilter.AGE_RANGE)
+    if RENDERED_OUTPUTS:
+        # the filter stores say what each panel will show once update_panel has drawn it, so cross_filter
+        # (set off by the age slider changing) leaves them to it
+        keys = [crossfilter.filter_key(crossfilter.panel_filters(view["filters"], panel)) for panel in PANELS]
+        return ([dash.no_update] * len(PANELS) + keys
+                + [view["dataset"], view["filters"], ages, crossfilter.summary(view["filters"])]
+                + [""] * len(RENDERED_OUTPUTS))
+    graphs, keys = view_figures(view)
+    store = dash.no_update
+    if STORE_OUTPUTS and not view["filters"]:
+        # show_dataset draws them from the store, so they only have to be sent once
+        store = Patch()
+        store[view["dataset"]] = graphs
+        graphs = [dash.no_update] * len(graphs)
+    return (graphs + keys + [view["dataset"] if view["dataset"] != dataset else dash.no_update, view["filters"],
+                             ages, crossfilter.summary(view["filters"])]
+            + [store] * len(STORE_OUTPUTS))
+
+
+# the year picker lists the years in WHD.csv as it is when the page loads, so it keeps up with data_watch.py
+@app.callback(Output("whd-year", "options"), Input("url", "pathname"))
+def year_options(pathname):
+    return [{"label": f"World Happiness Data {year}", "value": dataset}
+            for dataset, year in whd_year_datasets().items()]
+
+
+# whenever the dataset or the filters change, remember them for this session and put them in the url
+@app.callback(Output("url", "search"), Input("selected-dataset", "data"), Input("crossfilter", "data"),
+              State("url", "search"), prevent_initial_call=True)
+def remember_view(dataset, filters, search):
+    view = {"dataset": dataset, "filters": filters or {}}
+    session = flask.request.cookies.get(sessions.SESSION_COOKIE)
+    if session is None:
+        session = sessions.new_session()
+        ctx.response.set_cookie(sessions.SESSION_COOKIE, session, max_age=sessions.SESSION_TTL,
+                                httponly=True, samesite="Lax")
+    sessions.remember(session, view)
+    query = sessions.view_query(view)
+    return query if query != search else dash.no_update
+
+# animated figures arrive without their frames, this starts fetching them once the graph has the figure
+for panel in PANELS:
+    app.clientside_callback(
+        ClientsideFunction(namespace="dashboard", function_name="stream_frames"),
+        Output(f"{panel}-frames", "data"),
+        Input(f"{panel}-graph", "figure"), State(f"{panel}-graph", "id"))
 
 # FYI you can't have multiple callbacks with the same id so don't try lol
 
 # run the app
+# this is the development server, it's great for working on the app but only handles one request at a time
+# to run the app for real traffic, use gunicorn instead (see wsgi.py and the README)
 if __name__ == '__main__': 
+    # reload the csv files when they change, see data_watch.py
+    data_watch.start()
+    # the development server builds figures when they're first asked for, so there's nothing to wait for
+    startup.ready.set()
     app.run_server(debug=True)
@@ -0,0 +1,203 @@
+// these callbacks run in the browser instead of on the python server
+// Dash loads every .js file in the assets folder automatically, and appv1.py hooks them up with ClientsideFunction
+// see https://dash.plotly.com/clientside-callbacks
+
+// animation frames fetched from the server (see frames.py)
+// every graph keeps only its FRAME_CACHE_SIZE most recently used frames, in its own cache and in the graph itself,
+// so one animated graph can't push another one's frames out
+const FRAME_CACHE_SIZE = 24;
+const frameRequests = new Map();  // frame url -> fetch that's still running (shared, two graphs can want the same one)
+
+function graphFrameIndex(graph, name) {
+    const frames = (graph._transitionData && graph._transitionData._frames) || [];
+    return frames.findIndex(function (frame) { return String(frame.name) === String(name); });
+}
+
+// the graph's own frame cache: frame url -> {stream, name} (a Map remembers insertion order, oldest first)
+function graphFrameCache(graph) {
+    if (!graph._frameCache) {
+        graph._frameCache = new Map();
+    }
+    return graph._frameCache;
+}
+
+function rememberFrame(graph, url, entry) {
+    const cache = graphFrameCache(graph);
+    cache.delete(url);
+    cache.set(url, entry);
+    while (cache.size > FRAME_CACHE_SIZE) {
+        const [oldest, old] = cache.entries().next().value;
+        cache.delete(oldest);
+        // only take it out of the graph if the graph is still showing the figure it came from
+        const index = graph._frameStream === old.stream ? graphFrameIndex(graph, old.name) : -1;
+        if (index >= 0) {
+            window.Plotly.deleteFrames(graph, [index]);
+        }
+    }
+}
+
+// make sure one frame is in a graph, fetching it first if we don't have it
+function loadFrame(graph, stream, name) {
+    const url = stream.url + encodeURIComponent(name);
+    const cached = graphFrameCache(graph).get(url);
+    if (cached && graphFrameIndex(graph, name) >= 0) {
+        rememberFrame(graph, url, cached);
+        return Promise.resolve();
+    }
+    if (!frameRequests.has(url)) {
+        frameRequests.set(url, fetch(url).then(function (response) {
+            if (!response.ok) {
+                throw new Error("couldn't load animation frame " + url);
+            }
+            return response.json();
+        }).finally(function () { frameRequests.delete(url); }));
+    }
+    return frameRequests.get(url).then(function (frame) {
+        // the graph may have moved on to another figure while we were waiting
+        if (graph._frameStream !== stream.url) {
+            return;
+        }
+        if (graphFrameIndex(graph, name) < 0) {
+            window.Plotly.addFrames(graph, [frame]);
+        }
+        rememberFrame(graph, url, {stream: stream.url, name: name});
+    });
+}
+
+// start over for every figure the graph gets, even one with the same frame urls (the same figure sent again):
+// the figure arrives with no frames, so plotly.js has dropped the ones we'd added
+function streamFrames(graph, stream, figure) {
+    if (graph._frameFigure === figure) {
+        return;
+    }
+    graph._frameFigure = figure;
+    graph._frameStream = stream.url;
+    graphFrameCache(graph).clear();
+    if (!graph._frameListener) {
+        // dragging the slider to a frame we don't have yet: fetch it, then jump to it
+        graph.on("plotly_sliderchange", function (event) {
+            const current = graph._frameStream && graph.layout.meta && graph.layout.meta.frames;
+            const name = event.step && event.step.args && event.step.args[0] && event.step.args[0][0];
+            if (!current || name === undefined || graphFrameIndex(graph, name) >= 0) {
+                return;
+            }
+            loadFrame(graph, current, name).then(function () {
+                window.Plotly.animate(graph, [name], {mode: "immediate", frame: {duration: 0, redraw: true},
+                                                      transition: {duration: 0}});
+            });
+        });
+        graph._frameListener = true;
+    }
+    // prefetch the rest in the background, one at a time, so the play button has them ready
+    stream.names.slice(0, FRAME_CACHE_SIZE).reduce(function (previous, name) {
+        return previous.then(function () {
+            return graph._frameFigure === figure ? loadFrame(graph, stream, name) : null;
+        });
+    }, Promise.resolve()).catch(function (error) { console.warn(error); });
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: {
+        // which dataset button was clicked (or year picked) last
+        select_dataset: function () {
+            const triggered = window.dash_clientside.callback_context.triggered;
+            if (!triggered.length) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            if (triggered[0].prop_id === "whd-year.value") {
+                // the year dropdown's values are dataset ids already
+                return triggered[0].value;
+            }
+            if (!triggered[0].prop_id.endsWith(".n_clicks")) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            return triggered[0].prop_id.split(".")[0];
+        },
+
+        // only ask the server for a dataset's figures the first time it's selected
+        request_bundle: function (dataset, store) {
+            if (!dataset || (store && store[dataset])) {
+                return window.dash_clientside.no_update;
+            }
+            return dataset;
+        },
+
+        // swap every graph to the selected dataset's figures, straight from the store
+        // (the other arguments say which cross-filters each graph is showing, those graphs are left alone
+        // on the music survey - cross_filter in appv1.py sends them again when the filters are cleared)
+        show_dataset: function (dataset, store, ...filtered) {
+            const bundle = store && store[dataset];
+            if (!bundle) {
+                // still waiting for the server to send this dataset, we'll run again once it arrives
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const keep = filtered.map(function (key) { return dataset === "mxmh" && Boolean(key); });
+            const graphs = bundle.map(function (figure, i) {
+                return keep[i] ? window.dash_clientside.no_update : figure;
+            });
+            return graphs.concat(keep.map(function (kept) { return kept ? window.dash_clientside.no_update : ""; }));
+        },
+
+        // which panels are (at least partly) on screen right now, only updated when that changes
+        // (every panel's div id is passed in, in the order the panels are registered in)
+        visible_panels: function (n_intervals, current, ...div_ids) {
+            const panels = div_ids.map(function (div_id) { return div_id.replace(/-div$/, ""); });
+            const visible = panels.filter(function (panel) {
+                const div = document.getElementById(panel + "-div");
+                if (!div) {
+                    return false;
+                }
+                const rect = div.getBoundingClientRect();
+                return rect.bottom > 0 && rect.top < window.innerHeight && rect.height > 0;
+            });
+            if (current && visible.join() === current.join()) {
+                return window.dash_clientside.no_update;
+            }
+            return visible;
+        },
+
+        // ask the server for one panel's figure, but only if it's visible and showing a different dataset
+        request_panel: function (dataset, visible, rendered, div_id) {
+            const panel = div_id.replace(/-div$/, "");
+            if (!dataset || dataset === rendered || !(visible || []).includes(panel)) {
+                return window.dash_clientside.no_update;
+            }
+            return dataset;
+        },
+
+        // start streaming an animated figure's frames once its graph has drawn the first one
+        stream_frames: function (figure, graph_id) {
+            const stream = figure && figure.layout && figure.layout.meta && figure.layout.meta.frames;
+            // wait a moment so dcc.Graph has handed the new figure to plotly.js
+            setTimeout(function () {
+                const graph = document.querySelector("#" + graph_id + " .js-plotly-plot");
+                if (!graph) {
+                    return;
+                }
+                if (!stream) {
+                    graph._frameStream = null;
+                    graph._frameFigure = null;
+                    return;
+                }
+                streamFrames(graph, stream, figure);
+            }, 0);
+            return window.dash_clientside.no_update;
+        },
+
+        // forget the music survey cross-filters and put the age slider back to its full range
+        clear_filters: function (...args) {
+            // the inputs are every dataset button and the Clear Filters button, the slider's min and max come last
+            const [min, max] = args.slice(-2);
+            return [{}, [min, max], ""];
+        },
+
+        // show or hide an info modal without a trip to the server
+        toggle_modal: function (n_show, n_close) {
+            const triggered = window.dash_clientside.callback_context.triggered;
+            if (triggered.length && triggered[0].prop_id.startsWith("show-")) {
+                return [{"display": "block"}, {"zIndex": 1003}];
+            }
+            return [{"display": "none"}, {"zIndex": 0}];
+        },
+    },
+});
@@ -0,0 +1,2 @@
+# benchmarks for the app, run them from the app folder, e.g.
+#     python -m benchmarks.startup
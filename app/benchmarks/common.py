@@ -0,0 +1,47 @@
+# what the benchmarks share: where the app is, timing a function, and measuring in a fresh python process
+# (a fresh process starts with nothing imported or cached, like a new worker would)
+import os
+import subprocess
+import sys
+import time
+
+# the app folder, the benchmarks (and every process they start) run from there
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# where the scaled up csv files from benchmarks/synthetic.py are kept
+SYNTHETIC_DIR = os.path.join(APP_DIR, "build", "synthetic")
+
+
+def use_app_dir():
+    """
+    Make the app's modules importable, however the benchmark was started
+    """
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+
+
+def run_python(args, env=None):
+    """
+    Run python with `args` in a fresh process from the app folder, with env added to the environment
+    returns the finished process, with what it printed in .stdout and .stderr
+    """
+    return subprocess.run([sys.executable, *args], cwd=APP_DIR, env=dict(os.environ, **(env or {})), check=True,
+                          capture_output=True, text=True)
+
+
+def last_line(out):
+    """
+    The last line a process printed, where the measuring scripts put their result
+    """
+    return out.stdout.strip().splitlines()[-1]
+
+
+def best_of(repeat, fn, *args):
+    """
+    Call fn(*args) `repeat` times, returning (the fastest time in seconds, the last result)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
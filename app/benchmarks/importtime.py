@@ -0,0 +1,65 @@
+# keeps an eye on how long importing the app takes, using python -X importtime in a fresh process
+# each entry point has a budget, and the script exits with an error when one goes over it, so it can run in CI:
+#   wsgi with STARTUP=background - all a worker does before it starts listening (see startup.py)
+#   appv1                        - importing the whole app, which is what STARTUP=preload waits on before listening
+# it also lists the slowest modules to import, the first places to look when the budget gets tight
+# run from the app folder:
+#     python -m benchmarks.importtime --runs 3
+#     python -m benchmarks.importtime --budget appv1=1.5
+import argparse
+import statistics
+import sys
+
+from benchmarks.common import run_python
+
+# entry point -> (module to import, extra environment variables, budget in seconds)
+BUDGETS = {
+    "wsgi": ("wsgi", {"STARTUP": "background"}, 0.1),
+    "appv1": ("appv1", {}, 2.0),
+}
+
+
+def import_times(module, env):
+    """
+    Import a module in a fresh process, returning {module name: (self seconds, cumulative seconds)}
+    """
+    out = run_python(["-X", "importtime", "-c", f"import {module}"], env)
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.setdefault(name.strip(), (int(own) / 1e6, int(cumulative) / 1e6))
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the app's import time against a budget")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget", action="append", default=[], metavar="NAME=SECONDS",
+                        help="override a budget, e.g. appv1=1.5")
+    parser.add_argument("--top", type=int, default=10, help="how many of the slowest modules to list")
+    args = parser.parse_args(argv)
+
+    budgets = {name: list(entry) for name, entry in BUDGETS.items()}
+    for override in args.budget:
+        name, seconds = override.split("=")
+        budgets[name][2] = float(seconds)
+
+    over = []
+    for name, (module, env, budget) in budgets.items():
+        runs = [import_times(module, env) for _ in range(args.runs)]
+        median = statistics.median(times[module][1] for times in runs)
+        verdict = "ok" if median <= budget else "OVER BUDGET"
+        print(f"{name:>6}: {median:.3f}s (budget {budget:.3f}s) {verdict}")
+        if median > budget:
+            over.append(name)
+        slowest = sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        for slow, (own, _) in slowest:
+            print(f"        {own * 1000:7.1f}ms  {slow}")
+    if over:
+        sys.exit(f"over the import time budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# load test: fires dataset switches at a running copy of the app from several threads at once,
+# first against the development server and then against gunicorn with gunicorn.conf.py
+# run from the app folder (needs gunicorn installed):
+#     python -m benchmarks.load --clients 16 --requests 400
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import APP_DIR
+
+BUTTONS = ["mxmh", "whd15", "whd19", "whd"]
+DATASETS = ["mxmh", "whd15", "whd19", "whd"]
+GRAPHS = ["histo-graph", "dense-graph", "main-graph", "pie-graph", "scatter-graph"]
+
+
+def switch_body(dataset, shown="mxmh"):
+    """
+    The request the browser sends to update_graphs when a dataset button is clicked (or a year is picked),
+    while the graphs are showing the `shown` dataset
+    """
+    outputs = ([{"id": graph, "property": "figure"} for graph in GRAPHS] + [{"id": "selected-dataset", "property": "data"}]
+               + [{"id": graph.replace("-graph", "-filter"), "property": "data"} for graph in GRAPHS])
+    return json.dumps({
+        "output": ".." + "...".join(f"{output['id']}.{output['property']}" for output in outputs) + "..",
+        "outputs": outputs,
+        "inputs": [{"id": button, "property": "n_clicks", "value": 1 if button == dataset else None}
+                   for button in BUTTONS] + [{"id": "whd-year", "property": "value",
+                                              "value": None if dataset in BUTTONS else dataset}],
+        "changedPropIds": [f"{dataset}.n_clicks" if dataset in BUTTONS else "whd-year.value"],
+        "state": [{"id": "selected-dataset", "property": "data", "value": shown}]
+                 + [{"id": graph.replace("-graph", "-filter"), "property": "data", "value": ""} for graph in GRAPHS],
+    }).encode()
+
+
+def start_server(command, port, env):
+    """
+    Launch a server in its own process group and wait until it answers
+    """
+    env = dict(os.environ, **env)
+    proc = subprocess.Popen(command, cwd=APP_DIR, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_dash-layout", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.25)
+    stop_server(proc)
+    raise RuntimeError(f"{command} didn't start")
+
+
+def stop_server(proc):
+    os.killpg(proc.pid, signal.SIGTERM)
+    proc.wait(timeout=30)
+
+
+def run_load(port, clients, requests, datasets=DATASETS):
+    """
+    Send `requests` dataset switches from `clients` threads, return (requests per second, latencies)
+    """
+    url = f"http://127.0.0.1:{port}/_dash-update-component"
+
+    def one(i):
+        # every client clicks through the datasets in order, like someone looking at each one
+        body = switch_body(datasets[i % len(datasets)], datasets[(i - 1) % len(datasets)])
+        request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    return requests / (time.perf_counter() - start), latencies
+
+
+def summarize(throughput, latencies):
+    """
+    Throughput and latency percentiles of a load run, in seconds
+    """
+    latencies = sorted(latencies)
+    return {"requests_per_second": throughput, "p50": statistics.median(latencies),
+            "p95": latencies[max(int(len(latencies) * 0.95) - 1, 0)], "max": latencies[-1]}
+
+
+def report(name, throughput, latencies):
+    summary = summarize(throughput, latencies)
+    print(f"{name:>12}: {throughput:7.1f} req/s  p50 {summary['p50'] * 1000:7.1f}ms  "
+          f"p95 {summary['p95'] * 1000:7.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dataset switch throughput: dev server vs gunicorn")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--port", type=int, default=8051)
+    args = parser.parse_args(argv)
+
+    # load tests go through update_graphs, so ask for the server-side switching mode
+    env = {"DATASET_SWITCHING": "server"}
+    servers = [
+        ("dev server", [sys.executable, "appv1.py"], dict(env, PORT=str(args.port))),
+        ("gunicorn", [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:server"],
+         dict(env, BIND=f"127.0.0.1:{args.port}")),
+    ]
+    for name, command, server_env in servers:
+        proc = start_server(command, args.port, server_env)
+        try:
+            report(name, *run_load(args.port, args.clients, args.requests))
+        finally:
+            stop_server(proc)
+
+
+if __name__ == "__main__":
+    main()
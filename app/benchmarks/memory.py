@@ -0,0 +1,91 @@
+# how much memory a worker uses for the data, with and without DATA_COMPACT (see data.py)
+# for every scale (1 = the real csv files, 100 = a hundred times as many rows, from benchmarks/synthetic.py)
+# a fresh process loads both datasets and the views the figures use, and reports:
+#   frames  - the size of the loaded DataFrames, strings included (DataFrame.memory_usage(deep=True))
+#   rss     - the worker's resident memory, after importing the app's modules and after loading the data
+#   private - the part of rss no other worker can share (the data store's memory-mapped columns are shared)
+# run from the app folder:
+#     python -m benchmarks.memory --scales 1 100
+#     python -m benchmarks.memory --scales 1 --figures      (also builds every figure, slow at big scales)
+import argparse
+import json
+
+from benchmarks.common import SYNTHETIC_DIR, last_line, run_python, use_app_dir
+
+MEASURE_SCRIPT = """
+import json, sys
+
+def memory():
+    # kilobytes -> megabytes, from /proc (linux only)
+    values = {}
+    for name in ["status", "smaps_rollup"]:
+        try:
+            with open(f"/proc/self/{name}") as f:
+                for line in f:
+                    key, _, rest = line.partition(":")
+                    if rest.strip().endswith("kB"):
+                        values[key] = int(rest.split()[0]) / 1024
+        except OSError:
+            pass
+    private = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return {"rss": values.get("VmRSS"), "private": private or None}
+
+import data
+import figures
+result = {"imported": memory()}
+frames = {"music": data.music(), "music_with_effects": data.music_with_effects(), "whd": data.whd(),
+          "whd_by_year": data.whd_by_year()[0]}
+data.music_index()
+result["frames"] = {name: df.memory_usage(deep=True).sum() / 2**20 for name, df in frames.items()}
+result["rows"] = {"mxmh": len(frames["music"]), "whd": len(frames["whd"])}
+result["loaded"] = memory()
+if "--figures" in sys.argv:
+    for dataset in figures.FIGURE_BUILDERS:
+        figures.get_figures(dataset)
+    result["figures"] = memory()
+print(json.dumps(result))
+"""
+
+
+def csv_files(scale):
+    if scale == 1:
+        return {}
+    from benchmarks import synthetic
+
+    music_csv, whd_csv = synthetic.write_csvs(SYNTHETIC_DIR, scale)
+    return {"MUSIC_CSV": music_csv, "WHD_CSV": whd_csv}
+
+
+def measure(scale, compact, with_figures):
+    env = dict(DATA_COMPACT="1" if compact else "0", FIGURE_ARTIFACT="off", **csv_files(scale))
+    # the first run converts the csv files into the data store, the second one measures memory-mapping them
+    # the way every worker does after the first
+    for _ in range(2):
+        out = run_python(["-c", MEASURE_SCRIPT] + (["--figures"] if with_figures else []), env)
+    return json.loads(last_line(out))
+
+
+def mb(value):
+    return "   n/a" if value is None else f"{value:6.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare a worker's memory with and without DATA_COMPACT")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--figures", action="store_true", help="build every figure too")
+    args = parser.parse_args(argv)
+
+    use_app_dir()
+    stages = ["imported", "loaded"] + (["figures"] if args.figures else [])
+    for scale in args.scales:
+        for compact in [False, True]:
+            result = measure(scale, compact, args.figures)
+            frames = sum(result["frames"].values())
+            print(f"x{scale:<4} DATA_COMPACT={int(compact)}  {result['rows']['mxmh']:>7} survey rows  "
+                  f"frames {mb(frames)} MB")
+            for stage in stages:
+                print(f"        {stage:>9}: rss {mb(result[stage]['rss'])} MB  private {mb(result[stage]['private'])} MB")
+
+
+if __name__ == "__main__":
+    main()
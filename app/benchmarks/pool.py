@@ -0,0 +1,58 @@
+# compares building one dataset's figures serially vs in the figure pool, against the slowest single figure
+# the pool can't beat the slowest figure, so that's the number to aim for
+# run from the app folder:
+#     python -m benchmarks.pool --workers 5 --runs 3
+import argparse
+import os
+import statistics
+
+from benchmarks.common import last_line, run_python
+
+# times one cold get_figures() call in a fresh process, after the data is loaded
+# (so only figure building is measured), and prints the slowest single figure too
+BUILD_SCRIPT = """
+import sys, time
+import data, figures
+data.music(); data.whd()
+dataset = sys.argv[1]
+for panel in figures.PANELS:
+    figures.build_json(dataset, panel)  # the first build of each figure also fills the derived data caches
+slowest = max(figures.build_json(dataset, panel)[1] for panel in figures.PANELS)
+figures.figure_cache.invalidate()
+figures.figure_pool.get_pool()  # start the pool before the clock, like a warmed up worker would have
+start = time.perf_counter()
+figures.get_figures(dataset)
+print(time.perf_counter() - start, slowest)
+"""
+
+
+def time_switch(dataset, pool, workers, runs):
+    """
+    Return [(seconds to build the dataset, slowest single figure)] for `runs` fresh processes
+    """
+    env = dict(FIGURE_ARTIFACT="off", FIGURE_POOL=pool, FIGURE_WORKERS=str(workers))
+    results = []
+    for _ in range(runs):
+        total, slowest = last_line(run_python(["-c", BUILD_SCRIPT, dataset], env)).split()
+        results.append((float(total), float(slowest)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare serial and pooled figure building")
+    parser.add_argument("--datasets", nargs="+", default=["mxmh", "whd"])
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} cpus, {args.workers} workers")
+    for dataset in args.datasets:
+        for pool in ["serial", "thread", "process"]:
+            results = time_switch(dataset, pool, args.workers, args.runs)
+            total = statistics.median(r[0] for r in results)
+            slowest = statistics.median(r[1] for r in results)
+            print(f"{dataset:>6} {pool:>8}: median {total:.3f}s  (slowest single figure {slowest:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# compares the original step-by-step music survey cleaning with the pipeline in data.py
+# run from the app folder:
+#     python -m benchmarks.preprocess
+import argparse
+
+import data
+from benchmarks.common import best_of
+from benchmarks.synthetic import synthetic_music
+
+SCORES = ['Depression', 'Anxiety', 'OCD', 'Insomnia']
+
+
+def original_clean(musicdf):
+    """
+    The cleaning code as it was originally written, one fillna (and one column copy) at a time
+    """
+    musicdf = musicdf.drop(columns=data.MUSIC_DROP)
+    musicdf["Age"] = musicdf["Age"].fillna(value=round(musicdf.Age.mean()))
+    musicdf["Music effects"] = musicdf["Music effects"].fillna(value="No effect")
+    musicdf["While working"] = musicdf["While working"].fillna(value="No")
+    musicdf["Instrumentalist"] = musicdf["Instrumentalist"].fillna(value="No")
+    musicdf["Composer"] = musicdf["Composer"].fillna(value="No")
+    musicdf["Primary streaming service"] = musicdf["Primary streaming service"].fillna(value="I do not use a streaming service.")
+    musicdf["Mental health severity"] = musicdf["Anxiety"] + musicdf["Depression"] + musicdf["Insomnia"] + musicdf["OCD"]
+    return musicdf
+
+
+def original_violin_inputs(musicdf):
+    """
+    What the violins used to select per build: two masked Series per violin, 8 mask scans in total
+    """
+    return [(musicdf['Music effects'][musicdf['Music effects'] != 'No effect'],
+             musicdf[score][musicdf['Music effects'] != 'No effect']) for score in SCORES]
+
+
+def pipeline_violin_inputs(effectsdf):
+    """
+    What the violins select now: columns of the shared, already filtered view
+    """
+    return [(effectsdf['Music effects'], effectsdf[score]) for score in SCORES]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Music survey cleaning: original code vs the data.py pipeline")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>10} {'clean before':>13} {'clean after':>12} {'per build before':>17} {'per build after':>16}")
+    for rows in args.rows:
+        raw = synthetic_music(rows)
+        clean_before, cleaned = best_of(args.repeat, original_clean, raw)
+        # data.read_music skips the dropped columns while parsing, so they're not part of the pipeline's time
+        kept = raw.drop(columns=data.MUSIC_DROP)
+        clean_after, _ = best_of(args.repeat, data.clean, kept, data.MUSIC_IMPUTE, data.MUSIC_DERIVED)
+        build_before, _ = best_of(args.repeat, original_violin_inputs, cleaned)
+        # the filtered view is made once per process (data.music_with_effects), not once per build
+        effectsdf = cleaned[cleaned['Music effects'] != 'No effect']
+        build_after, _ = best_of(args.repeat, pipeline_violin_inputs, effectsdf)
+        print(f"{rows:>10} {clean_before * 1000:>11.1f}ms {clean_after * 1000:>10.1f}ms "
+              f"{build_before * 1000:>15.2f}ms {build_after * 1000:>14.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# compares the ways a figure can be turned into JSON: plotly.io.to_json (the old path), orjson straight
+# from fig.to_plotly_json(), and orjson with base64 typed arrays for the numeric columns
+# run from the app folder:
+#     python -m benchmarks.serialize --rows 100000 --repeat 5
+import argparse
+import json
+import timeit
+
+from benchmarks.common import use_app_dir
+
+
+def encoders():
+    """
+    name -> function(fig) returning JSON text, for every path we want to compare
+    """
+    import orjson
+    import plotly.io as pio
+
+    import figure_cache
+
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def plotly_json(fig):
+        return pio.to_json(fig, validate=False)
+
+    def fast_json(fig):
+        return orjson.dumps(fig.to_plotly_json(), default=figure_cache._orjson_default, option=option).decode()
+
+    def typed_arrays(fig):
+        figure = figure_cache.encode_typed_arrays(fig.to_plotly_json())
+        return orjson.dumps(figure, default=figure_cache._orjson_default, option=option).decode()
+
+    return {"plotly.io": plotly_json, "orjson": fast_json, "orjson+typed": typed_arrays}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare figure serialization time and size")
+    parser.add_argument("--rows", type=int, default=0, help="resample the music survey to this many rows first")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    use_app_dir()
+    import data
+    from figures import FIGURE_BUILDERS, PANELS
+
+    if args.rows:
+        # swap the real survey for a bigger synthetic one, cleaned the same way data.music() does it
+        from benchmarks.synthetic import synthetic_music
+        raw = synthetic_music(args.rows).drop(columns=data.MUSIC_DROP)
+        big = data.clean(raw, data.MUSIC_IMPUTE, data.MUSIC_DERIVED).astype(
+            {column: "category" for column in data.MUSIC_CATEGORIES})
+        data.music = lambda: big
+
+    paths = encoders()
+    print(f"{'figure':>14} " + " ".join(f"{name:>22}" for name in paths))
+    totals = {name: [0.0, 0] for name in paths}
+    for dataset in FIGURE_BUILDERS:
+        for panel in PANELS:
+            fig = FIGURE_BUILDERS[dataset][panel]()
+            cells = []
+            for name, encode in paths.items():
+                seconds = min(timeit.repeat(lambda: encode(fig), number=1, repeat=args.repeat))
+                size = len(encode(fig))
+                totals[name][0] += seconds
+                totals[name][1] += size
+                cells.append(f"{seconds * 1000:8.1f}ms {size / 1024:9.0f}KiB")
+            print(f"{dataset + '/' + panel:>14} " + " ".join(cells))
+    print(f"{'total':>14} " + " ".join(f"{s * 1000:8.1f}ms {b / 1024:9.0f}KiB" for s, b in totals.values()))
+    # sanity check: the plain orjson path has to produce exactly what plotly.io does
+    fig = FIGURE_BUILDERS["whd"]["scatter"]()
+    assert json.loads(paths["orjson"](fig)) == json.loads(paths["plotly.io"](fig))
+
+
+if __name__ == "__main__":
+    main()
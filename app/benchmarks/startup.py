@@ -0,0 +1,48 @@
+# compares how long a fresh worker takes to start up with and without the precomputed figure artifact
+# run from the app folder:
+#     python precompute.py
+#     python -m benchmarks.startup --runs 5
+import argparse
+import os
+import statistics
+import sys
+
+from benchmarks.common import last_line, run_python, use_app_dir
+
+# imports the app, renders the layout and gets the first dataset's figures (they're sent once the page has loaded),
+# which is what a new worker has to do before serving anyone
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import appv1
+appv1.app.server.test_client().get("/_dash-layout")
+appv1.get_figures(appv1.START_DATASET)
+print(time.perf_counter() - start)
+"""
+
+
+def time_startup(artifact, runs):
+    """
+    Start a fresh python process `runs` times and return the startup times in seconds
+    """
+    return [float(last_line(run_python(["-c", STARTUP_SCRIPT], {"FIGURE_ARTIFACT": artifact}))) for _ in range(runs)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare worker startup time with and without the figure artifact")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    use_app_dir()
+    import precompute
+
+    if not os.path.exists(precompute.DEFAULT_ARTIFACT):
+        sys.exit("no figure artifact found, run `python precompute.py` first")
+
+    for name, artifact in [("csv + build figures", "off"), ("precomputed artifact", precompute.DEFAULT_ARTIFACT)]:
+        times = time_startup(artifact, args.runs)
+        print(f"{name:>22}: median {statistics.median(times):.3f}s  min {min(times):.3f}s  max {max(times):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# the whole benchmark suite in one go, with the results saved as JSON so runs can be compared over time
+# for every scale (1 = the real csv files, 10 = ten times as many rows, up to 1000) it measures, in a fresh process:
+#   load      - parsing and cleaning the csv files, and loading them back from the data store
+#   figures   - building and serializing every panel of every dataset (time and size)
+#   requests  - dataset switches sent to a locally started gunicorn by several clients at once
+# the scaled up csv files come from benchmarks/synthetic.py and are kept in build/synthetic/ for next time
+# run from the app folder (the requests part needs gunicorn installed):
+#     python -m benchmarks.suite --scales 1 10 100 --load-scales 1 10
+# results go to build/benchmarks/<time>-<commit>.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import APP_DIR, SYNTHETIC_DIR, best_of, last_line, run_python, use_app_dir
+from benchmarks.load import run_load, start_server, stop_server, summarize
+
+RESULTS_DIR = os.path.join(APP_DIR, "build", "benchmarks")
+
+
+def measure(repeat):
+    """
+    Time loading and every figure for whatever csv files MUSIC_CSV / WHD_CSV point at (runs in a child process)
+    """
+    import pandas as pd
+
+    import data
+    import data_store
+    from figure_cache import serialize_figure
+    from figures import FIGURE_BUILDERS, PANELS
+
+    results = {"rows": {}, "load": {}, "figures": {}}
+    results["load"]["music_csv"] = best_of(repeat, data.read_music)[0]
+    results["load"]["whd_csv"] = best_of(repeat, lambda: pd.read_csv(data.WHD_CSV, encoding="utf-8-sig"))[0]
+    # the first call converts the csv into the store, after that it's only memory-mapped
+    results["rows"] = {"mxmh": len(data.music()), "whd": len(data.whd())}
+    results["load"]["music_store"] = best_of(repeat, data_store.cached_frame, "mxmh", data.MUSIC_CSV,
+                                             data.read_music, data.MUSIC_CATEGORIES)[0]
+    # (importing figures already built the year index once, so start it over)
+    data.whd_by_year.cache_clear()
+    results["load"]["whd_year_index"] = best_of(1, data.whd_by_year)[0]
+
+    for dataset in FIGURE_BUILDERS:
+        for panel in PANELS:
+            build = FIGURE_BUILDERS[dataset][panel]
+            start = time.perf_counter()
+            fig = build()
+            first = time.perf_counter() - start
+            start = time.perf_counter()
+            text, _ = serialize_figure(fig)
+            results["figures"][f"{dataset}/{panel}"] = {
+                "first_build": first,
+                "build": best_of(repeat, build)[0],
+                "serialize": time.perf_counter() - start,
+                "bytes": len(text),
+            }
+    return results
+
+
+def run_measure(env, repeat):
+    """
+    Run measure() in a fresh python process with env added to the environment
+    """
+    return json.loads(last_line(run_python(["-m", "benchmarks.suite", "--measure", "--repeat", str(repeat)], env)))
+
+
+def run_requests(env, clients, requests, port):
+    """
+    Start gunicorn on the given data and time dataset switches against it
+    """
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:server"]
+    proc = start_server(command, port, dict(env, DATASET_SWITCHING="server", BIND=f"127.0.0.1:{port}"))
+    try:
+        # the first switch to each dataset builds its figures, so time that on its own
+        start = time.perf_counter()
+        run_load(port, 1, 4)
+        warm = time.perf_counter() - start
+        return dict(summarize(*run_load(port, clients, requests)), clients=clients, requests=requests,
+                    first_switches=warm)
+    finally:
+        stop_server(proc)
+
+
+def environment():
+    """
+    What the numbers were measured on
+    """
+    import dash
+    import pandas
+    import plotly
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, check=True,
+                                capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "versions": {"dash": dash.__version__, "plotly": plotly.__version__, "pandas": pandas.__version__}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run every benchmark and save the results as JSON")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--load-scales", type=int, nargs="*", default=[1],
+                        help="scales to also run the concurrent request test at (needs gunicorn)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8052)
+    parser.add_argument("--output", default=None, help="where to write the JSON (default: build/benchmarks/)")
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    use_app_dir()
+    if args.measure:
+        print(json.dumps(measure(args.repeat)))
+        return
+
+    from benchmarks.synthetic import write_csvs
+
+    results = {"environment": environment(), "scales": {}}
+    for scale in sorted(set(args.scales) | set(args.load_scales)):
+        music_csv, whd_csv = write_csvs(SYNTHETIC_DIR, scale)
+        with tempfile.TemporaryDirectory() as store:
+            # fresh data store and no precomputed figures, so every run starts from the csv files
+            env = {"MUSIC_CSV": music_csv, "WHD_CSV": whd_csv, "DATA_STORE": store, "FIGURE_ARTIFACT": "off"}
+            scale_results = {}
+            if scale in args.scales:
+                scale_results.update(run_measure(env, args.repeat))
+                slowest = max(scale_results["figures"].items(), key=lambda item: item[1]["build"])
+                print(f"x{scale}: {scale_results['rows']} rows, music csv {scale_results['load']['music_csv']:.3f}s, "
+                      f"slowest figure {slowest[0]} {slowest[1]['build']:.3f}s")
+            if scale in args.load_scales:
+                scale_results["requests"] = run_requests(env, args.clients, args.requests, args.port)
+                print(f"x{scale}: {scale_results['requests']['requests_per_second']:.1f} req/s, "
+                      f"p95 {scale_results['requests']['p95'] * 1000:.1f}ms")
+        results["scales"][str(scale)] = scale_results
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['environment']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
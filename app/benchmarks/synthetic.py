@@ -0,0 +1,62 @@
+# synthetic data generators for the benchmarks
+# they resample the real csv files, so the new rows have the same columns, categories and missing values
+import os
+
+import numpy as np
+import pandas as pd
+
+import data
+
+
+def synthetic_music(rows, seed=0):
+    """
+    A raw (uncleaned) music survey with `rows` answers, resampled from mxmh_survey_results.csv
+    """
+    raw = pd.read_csv(data.MUSIC_CSV)
+    rng = np.random.default_rng(seed)
+    df = raw.iloc[rng.integers(0, len(raw), rows)].reset_index(drop=True)
+    # nudge the ages and listening hours so the rows aren't exact copies
+    df["Age"] = df["Age"] + rng.integers(-2, 3, rows)
+    df["Hours per day"] = (df["Hours per day"] * rng.uniform(0.8, 1.2, rows)).round(1)
+    return df
+
+
+# the numeric world happiness columns that get nudged in the synthetic copies
+WHD_MEASURES = ["Happiness Score", "Economy (GDP per Capita)", "Family", "Health (Life Expectancy)", "Freedom",
+                "Trust (Government Corruption)", "Generosity"]
+
+
+def synthetic_whd(scale, seed=0):
+    """
+    WHD.csv with every country copied `scale` times ("Chad", "Chad 2", "Chad 3", ...), every year kept
+    the copies share their original's region and map location, with their scores nudged a little
+    """
+    raw = pd.read_csv(data.WHD_CSV, encoding="utf-8-sig")
+    rng = np.random.default_rng(seed)
+    copies = []
+    for copy in range(scale):
+        df = raw.copy()
+        if copy:
+            df["Country"] = df["Country"] + f" {copy + 1}"
+            df[WHD_MEASURES] = df[WHD_MEASURES] * rng.uniform(0.95, 1.05, (len(df), len(WHD_MEASURES)))
+        copies.append(df)
+    df = pd.concat(copies, ignore_index=True)
+    # rank every copy against each other within its year, like the real report does
+    df["Happiness Rank"] = df.groupby("Year")["Happiness Score"].rank(ascending=False, method="first").astype(int)
+    return df
+
+
+def write_csvs(directory, scale, seed=0):
+    """
+    Write music survey and world happiness csv files `scale` times the real size, returning their paths
+    point the app at them with the MUSIC_CSV and WHD_CSV environment variables
+    """
+    os.makedirs(directory, exist_ok=True)
+    music_csv = os.path.join(directory, f"mxmh-x{scale}.csv")
+    whd_csv = os.path.join(directory, f"WHD-x{scale}.csv")
+    rows = len(pd.read_csv(data.MUSIC_CSV, usecols=[0]))
+    if not os.path.exists(music_csv):
+        synthetic_music(rows * scale, seed).to_csv(music_csv, index=False)
+    if not os.path.exists(whd_csv):
+        synthetic_whd(scale, seed).to_csv(whd_csv, index=False)
+    return music_csv, whd_csv
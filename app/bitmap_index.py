@@ -0,0 +1,60 @@
+# a bitmap index over a few columns of a DataFrame, for answering filters like
+#     Fav genre in (Rock, Pop) and Music effects = Improve and 18 <= Age <= 30
+# without scanning the DataFrame: every value of every indexed column has a bitmap with one bit per row
+# (packed 8 rows to a byte with np.packbits), so a filter is a handful of bitwise ORs and ANDs
+# numeric columns like Age are range-encoded: bitmap i has the rows whose value is <= the i-th distinct value,
+# so any range is at most two bitmaps, however wide it is
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+class BitmapIndex:
+    """
+    Bitmaps of which rows have each value of the `categorical` columns and each range of the `ranges` columns
+    """
+
+    def __init__(self, df, categorical=(), ranges=(), cache_size=256):
+        self.rows = len(df)
+        self.none = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        self.all = np.packbits(np.ones(self.rows, dtype=bool))
+        self.values = {}  # column -> {value: bitmap}
+        for column in categorical:
+            codes, uniques = pd.factorize(df[column])
+            self.values[column] = {value: np.packbits(codes == i) for i, value in enumerate(uniques)}
+        self.ranges = {}  # column -> (sorted distinct values, [bitmap of rows <= each of them])
+        for column in ranges:
+            values = df[column].to_numpy(dtype=float)
+            levels = np.unique(values[~np.isnan(values)])
+            # rows with no value get a rank past the end, so they're never in a range
+            ranks = np.where(np.isnan(values), len(levels), np.searchsorted(levels, values))
+            self.ranges[column] = (levels, [np.packbits(ranks <= i) for i in range(len(levels))])
+        # the same filters get asked for over and over while someone clicks around, so remember the last few
+        self.select = lru_cache(maxsize=cache_size)(self._select)
+
+    def bitmap(self, filters):
+        """
+        The bitmap of rows matching every (column, values) filter - any of the values for categorical columns,
+        and (low, high) inclusive for range columns
+        """
+        result = self.all
+        for column, wanted in filters:
+            if column in self.ranges:
+                result = result & self._range(column, *wanted)
+            else:
+                bitmaps = [self.values[column][value] for value in wanted if value in self.values[column]]
+                result = result & (np.bitwise_or.reduce(bitmaps) if bitmaps else self.none)
+        return result
+
+    def _range(self, column, low, high):
+        levels, at_most = self.ranges[column]
+        # the last distinct value <= high, and the last one < low
+        top = np.searchsorted(levels, high, side="right") - 1
+        bottom = np.searchsorted(levels, low, side="left") - 1
+        bits = at_most[top] if top >= 0 else self.none
+        return bits & ~at_most[bottom] if bottom >= 0 else bits
+
+    def _select(self, filters):
+        # filters has to be hashable for the cache: a tuple of (column, tuple of values)
+        return np.flatnonzero(np.unpackbits(self.bitmap(filters), count=self.rows))
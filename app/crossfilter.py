@@ -0,0 +1,114 @@
+# cross-filtering for the music survey: clicking a genre in the histogram, a violin in the main plot or a
+# streaming service in the sunburst (or narrowing the age slider) filters every other panel down to those people
+# click the same thing again to take it back out of the filter
+# the filters are answered by data.music_index() (see bitmap_index.py) instead of scanning the DataFrame,
+# and the filtered figures are kept in their own LRU cache so clicking back and forth doesn't rebuild them
+# settings (environment variables):
+#   CROSSFILTER_CACHE_SIZE - how many filtered figures to keep (default 100)
+import json
+import os
+
+import plotly.graph_objects as go
+
+import data
+import figures
+from figure_cache import FigureCache
+
+CROSSFILTER_CACHE_SIZE = int(os.environ.get("CROSSFILTER_CACHE_SIZE", 100))
+# the ends of the age slider, a range that covers all of it doesn't filter anything
+AGE_RANGE = [0, 100]
+
+# which column clicking on a panel filters by (a panel is never filtered by its own clicks,
+# so the thing you clicked on stays there to click again)
+PANEL_FILTERS = {"histo": "Fav genre", "main": "Music effects", "pie": "Primary streaming service"}
+
+# every panel's music survey function, they all take the filtered DataFrame
+BUILDERS = figures.FIGURE_BUILDERS["mxmh"]
+
+filtered_figures = FigureCache(max_size=CROSSFILTER_CACHE_SIZE, fingerprint=data.source_versions)
+for panel in figures.PANELS:
+    filtered_figures.watch(("mxmh", panel), data.MUSIC_FILE)
+
+
+def clicked_value(panel, click_data):
+    """
+    What was clicked on: the genre bar, the Improve/Worsen violin, or the streaming service of a sunburst slice
+    """
+    point = (click_data or {}).get("points", [{}])[0]
+    if panel == "pie":
+        # slices are "Spotify" or "Spotify/Yes", either one means Spotify
+        return str(point.get("id", point.get("label", ""))).split("/")[0] or None
+    return point.get("x")
+
+
+def update_filters(filters, panel, click_data, ages):
+    """
+    The filters after a click on `panel` (or after the age slider moved, when panel is None)
+    filters look like {"Fav genre": ["Rock", "Pop"], "Age": [18, 30]}
+    """
+    filters = dict(filters or {})
+    if panel in PANEL_FILTERS:
+        column, value = PANEL_FILTERS[panel], clicked_value(panel, click_data)
+        chosen = list(filters.get(column, []))
+        if value is not None:
+            chosen.remove(value) if value in chosen else chosen.append(value)
+        filters[column] = chosen
+    if ages is not None:
+        filters["Age"] = list(ages)
+    # leave out anything that doesn't filter, so "no filters" always looks the same
+    return {column: values for column, values in filters.items()
+            if values and not (column == "Age" and values == AGE_RANGE)}
+
+
+def panel_filters(filters, panel):
+    """
+    The filters that apply to one panel, in the hashable form data.music_index() takes
+    """
+    return tuple((column, tuple(values) if column == "Age" else tuple(sorted(values)))
+                 for column, values in sorted(filters.items()) if column != PANEL_FILTERS.get(panel))
+
+
+def filter_key(filters):
+    """
+    A short string for a panel's filters, "" when there are none (the browser keeps it, see appv1.py)
+    """
+    return json.dumps(filters) if filters else ""
+
+
+def filtered_music(filters):
+    return data.music().iloc[data.music_index().select(filters)]
+
+
+def no_answers():
+    fig = go.Figure()
+    fig.add_annotation(text="No survey answers match these filters", showarrow=False,
+                       xref="paper", yref="paper", x=0.5, y=0.5)
+    fig.update_layout(xaxis_visible=False, yaxis_visible=False)
+    return fig
+
+
+def get_figure(panel, filters):
+    """
+    One music survey panel drawn for only the answers matching `filters` (from panel_filters)
+    """
+    if not filters:
+        return figures.get_figure("mxmh", panel)
+
+    def build():
+        musicdf = filtered_music(filters)
+        return BUILDERS[panel](musicdf) if len(musicdf) else no_answers()
+
+    with data.pinned():
+        return filtered_figures.get(("mxmh", panel, filters), build)
+
+
+def summary(filters):
+    """
+    A line of text saying what's filtered and how many people are left
+    """
+    if not filters:
+        return ""
+    people = len(data.music_index().select(panel_filters(filters, None)))
+    parts = [f"Age {values[0]}-{values[1]}" if column == "Age" else f"{column}: {', '.join(map(str, values))}"
+             for column, values in filters.items()]
+    return f"Showing {people} people ({'; '.join(parts)})"
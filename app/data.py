@@ -0,0 +1,297 @@
+# all the data loading and churning for the app lives here
+# nothing is read until a figure actually needs it, so if the figures were precomputed
+# (see precompute.py) the app can start without touching pandas at all
+# settings (environment variables):
+#   DATA_COMPACT - "1" (default) keeps the music survey's answer columns as small codes instead of strings
+#                  (see compact_music below), "0" keeps them as the strings read from the csv
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+import aggregate
+import bitmap_index
+import data_sources
+import data_store
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+# MUSIC_CSV and WHD_CSV can point somewhere else, like the scaled up copies from benchmarks/synthetic.py
+MUSIC_CSV = os.environ.get("MUSIC_CSV", os.path.join(ASSETS, "mxmh_survey_results.csv"))
+WHD_CSV = os.environ.get("WHD_CSV", os.path.join(ASSETS, "WHD.csv"))
+DATA_COMPACT = os.environ.get("DATA_COMPACT", "1") == "1"
+
+# the survey's yes/no questions, and the answers to every "Frequency [genre]" question, least often first
+MUSIC_YES_NO = ['While working', 'Instrumentalist', 'Composer', 'Exploratory', 'Foreign languages']
+FREQUENCY_LEVELS = ['Never', 'Rarely', 'Sometimes', 'Very frequently']
+
+# text columns that are stored as pandas categories (much smaller than plain strings)
+MUSIC_CATEGORIES = ['Fav genre', 'Primary streaming service', 'Music effects']
+if DATA_COMPACT:
+    MUSIC_CATEGORIES += MUSIC_YES_NO
+WHD_CATEGORIES = ['Region']
+
+
+# add all constants and code associated with data churning below
+# columns we don't need at all (they're skipped while the csv is being read)
+MUSIC_DROP = ['Timestamp', 'Permissions']
+# you can decide how to handle missing data per column
+# a value is used as-is, and "mean" fills in the rounded average of the column
+MUSIC_IMPUTE = {
+    # for example, with age you might want to impute a value based on the mean
+    "Age": "mean",
+    # for something like music effects, you might want to assume no effect since it was not reported
+    "Music effects": "No effect",
+    "While working": "No",
+    "Instrumentalist": "No",
+    "Composer": "No",
+    "Primary streaming service": "I do not use a streaming service.",
+}
+# you can also make new values, each one is a function of the cleaned DataFrame
+MUSIC_DERIVED = {
+    "Mental health severity": lambda df: df["Anxiety"] + df["Depression"] + df["Insomnia"] + df["OCD"],
+}
+
+
+def clean(df, impute, derived):
+    """
+    Fill in missing values and add derived columns, following the rules above
+    """
+    # a shallow copy shares the column data, so only the columns we actually fill get new memory
+    df = df.copy(deep=False)
+    for column, rule in impute.items():
+        df[column] = df[column].fillna(value=round(df[column].mean()) if rule == "mean" else rule)
+    for name, make in derived.items():
+        df[name] = make(df)
+    return df
+
+
+# every loaded DataFrame (and every view computed from one) lives in a snapshot, keyed by function and arguments
+# when a csv file changes, data_watch.py builds a whole new snapshot next to the old one and swaps it in at once,
+# so a figure that's halfway built keeps reading the data it started with (see pinned())
+_snapshot = {"frames": {}, "versions": {}}
+_pinned = threading.local()
+_functions = {}  # cache name -> (function, the csv file it depends on)
+
+
+def current_snapshot():
+    return getattr(_pinned, "snapshot", None) or _snapshot
+
+
+@contextmanager
+def pinned(snapshot=None):
+    """
+    Read everything inside the with block from one snapshot (the current one, unless you pass another)
+    """
+    if getattr(_pinned, "snapshot", None) is not None and snapshot is None:
+        yield _pinned.snapshot
+        return
+    previous, _pinned.snapshot = getattr(_pinned, "snapshot", None), snapshot or _snapshot
+    try:
+        yield _pinned.snapshot
+    finally:
+        _pinned.snapshot = previous
+
+
+def snapshot_cache(source):
+    """
+    Like lru_cache, but the results live in the data snapshot and are thrown away when `source` changes
+    """
+    def decorate(function):
+        name = f"{function.__module__}.{function.__qualname__}"
+        _functions[name] = (function, source)
+
+        @wraps(function)
+        def cached(*args, **kwargs):
+            frames = current_snapshot()["frames"]
+            key = (name, args, tuple(sorted(kwargs.items())))
+            if key not in frames:
+                # two threads might both compute it, that's fine, the first one to finish wins
+                frames.setdefault(key, function(*args, **kwargs))
+            return frames[key]
+
+        cached.cache_name = name
+        cached.cache_clear = lambda: current_snapshot()["frames"].pop((name, (), ()), None)
+        return cached
+    return decorate
+
+
+def source_versions(paths):
+    """
+    How many times each csv file has been reloaded - figures remember this so they know when they're out of date
+    """
+    versions = current_snapshot()["versions"]
+    return tuple(versions.get(path, 0) for path in paths)
+
+
+def next_snapshot(source, frames):
+    """
+    A new snapshot with `source` replaced by `frames` ({cache name: DataFrame}), nothing else changes
+    every view that was computed from the old data is computed again from the new data, before anyone can see it
+    """
+    old = _snapshot
+    new = {"frames": {key: value for key, value in list(old["frames"].items()) if _functions[key[0]][1] != source},
+           "versions": dict(old["versions"], **{source: old["versions"].get(source, 0) + 1})}
+    for name, frame in frames.items():
+        new["frames"][(name, (), ())] = frame
+    with pinned(new):
+        for name, args, kwargs in list(old["frames"]):
+            function, depends_on = _functions[name]
+            if depends_on == source and (name, args, kwargs) not in new["frames"]:
+                try:
+                    new["frames"][(name, args, kwargs)] = function(*args, **dict(kwargs))
+                except (KeyError, IndexError, ValueError):
+                    # not there in the new data (like a year that was taken out), leave it for whoever asks next
+                    pass
+    return new
+
+
+def install(snapshot):
+    """
+    Swap in a snapshot made by next_snapshot(), requests that already started keep using the old one
+    """
+    global _snapshot
+    _snapshot = snapshot
+
+
+# where the rows come from - the csv files by default, set MUSIC_SOURCE / WHD_SOURCE to read a database table
+# instead, like MUSIC_SOURCE=sqlite:build/data.db#mxmh (see data_sources.py)
+music_source = data_sources.open_source(os.environ.get("MUSIC_SOURCE", MUSIC_CSV), "mxmh", exclude=MUSIC_DROP)
+# WHD.csv starts with a byte order mark, utf-8-sig strips it from the first column name
+whd_source = data_sources.open_source(os.environ.get("WHD_SOURCE", WHD_CSV), "whd", encoding="utf-8-sig")
+# the files they read, everything loaded from them gets reloaded when these change
+MUSIC_FILE = music_source.path
+WHD_FILE = whd_source.path
+
+
+# import all data for figures below
+# the sources are only read the first time, after that they're memory-mapped from data_store
+# this is from the starting dataset
+@snapshot_cache(MUSIC_FILE)
+def music():
+    return data_store.cached_frame("mxmh", MUSIC_FILE, read_music, MUSIC_CATEGORIES)
+
+
+def read_music(source=music_source):
+    musicdf = source.read()
+    # feel free to impute missing values however you wish for your data
+    musicdf = clean_music(musicdf)
+    # data churning is done!!!
+    return musicdf
+
+
+def clean_music(musicdf):
+    musicdf = clean(musicdf, MUSIC_IMPUTE, MUSIC_DERIVED)
+    return compact_music(musicdf) if DATA_COMPACT else musicdf
+
+
+def compact_music(musicdf):
+    """
+    Store the answer columns in a byte per answer instead of a string each:
+    the frequency questions become ordered categories (int8 codes, Never < Rarely < ...), and the yes/no questions
+    two-value categories, which are as small as booleans but still say Yes and No in the plots
+    """
+    for column in musicdf.columns:
+        if column.startswith("Frequency ["):
+            musicdf[column] = pd.Categorical(musicdf[column], categories=FREQUENCY_LEVELS, ordered=True)
+        elif column in MUSIC_YES_NO:
+            # in the order they first show up, so the plots stack and color them the same as the strings
+            musicdf[column] = pd.Categorical(musicdf[column], categories=pd.unique(musicdf[column].dropna()))
+    return musicdf
+
+
+# the views below are computed once and shared by every figure that needs them
+@snapshot_cache(MUSIC_FILE)
+def music_with_effects():
+    """
+    Survey answers from people who said music helps or hurts (everyone but "No effect")
+    """
+    return with_effects(music())
+
+
+def with_effects(musicdf):
+    return musicdf[musicdf['Music effects'] != 'No effect']
+
+
+# the survey columns you can cross-filter the dashboard by (see crossfilter.py)
+MUSIC_FILTERS = ['Fav genre', 'Primary streaming service', 'Music effects']
+MUSIC_RANGE_FILTERS = ['Age']
+
+
+@snapshot_cache(MUSIC_FILE)
+def music_index():
+    """
+    Bitmap index over the filter columns, so any combination of filters is a few bitwise ANDs
+    """
+    return bitmap_index.BitmapIndex(music(), MUSIC_FILTERS, MUSIC_RANGE_FILTERS)
+
+
+@snapshot_cache(MUSIC_FILE)
+def music_counts(*columns):
+    """
+    How many people gave each combination of answers to `columns` - a database source counts them itself,
+    so only the counts come back, not every row (only for columns without a "mean" rule in MUSIC_IMPUTE)
+    """
+    if isinstance(music_source, data_sources.CsvSource):
+        return aggregate.count_table(music(), *columns)
+    fill = {column: rule for column, rule in MUSIC_IMPUTE.items() if column in columns and rule != "mean"}
+    return music_source.count_by(list(columns), fill)
+
+
+# this is from the datasets that'll be added later
+@snapshot_cache(WHD_FILE)
+def whd():
+    return data_store.cached_frame("whd", WHD_FILE, read_whd, WHD_CATEGORIES)
+
+
+def read_whd(source=whd_source):
+    return source.read()
+
+
+@snapshot_cache(WHD_FILE)
+def whd_by_year():
+    """
+    Every year of WHD.csv indexed by country and sorted by year, with the derived columns added once,
+    plus {year: (first row, last row + 1)} so any single year is just a slice of it
+    """
+    whddf = whd().sort_values('Year', kind='stable')
+    years = whddf['Year'].to_numpy()
+    yeardf = whddf.set_index('Country').drop(columns=['Year'])
+    yeardf["Happiness Ratio"] = 1/yeardf["Happiness Rank"]
+    starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    stops = np.r_[starts[1:], len(years)]
+    return yeardf, {int(years[start]): (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+
+def whd_years():
+    """
+    Every year in WHD.csv, oldest first
+    """
+    return sorted(whd_by_year()[1])
+
+
+def whd_year(year):
+    """
+    One year of the world happiness data, indexed by country
+    slicing shares memory with whd_by_year(), so adding more years doesn't add more copies
+    """
+    yeardf, rows = whd_by_year()
+    start, stop = rows[year]
+    return yeardf.iloc[start:stop]
+
+
+# which files each dataset button is built from
+# (the single year datasets like whd15 all come from WHD_FILE too, see figures.py)
+SOURCES = {
+    "mxmh": [MUSIC_FILE],
+    "whd": [WHD_FILE],
+}
+
+# how each file gets reloaded when it changes (see data_watch.py): the function whose result it replaces,
+# where its rows come from, what to do with them, and the text columns that become categories
+RELOADABLE = {
+    "mxmh": {"source": music_source, "loader": music, "clean": clean_music, "categorical": MUSIC_CATEGORIES},
+    "whd": {"source": whd_source, "loader": whd, "clean": None, "categorical": WHD_CATEGORIES},
+}
@@ -0,0 +1,234 @@
+# where each dataset's rows come from: a csv file (the default), or a table in an SQLite or DuckDB database
+# pick one per dataset with MUSIC_SOURCE / WHD_SOURCE (see data.py), written as
+#     path/to/file.csv
+#     sqlite:path/to/file.db#table
+#     duckdb:path/to/file.duckdb#table      (needs pip install duckdb)
+# the table name after # is optional and defaults to the dataset's name (mxmh or whd)
+# database sources keep a small pool of connections so several threads can query at once, and can do
+# group-by counts inside the database (count_by) instead of pulling every row into pandas first
+# that's the only thing pushed down to the database: every dataset is still read whole once (into the data store,
+# see data_store.py), since the cleaning rules, the bitmap index and hot reload all work on the full rows, and the
+# cross-filtered views are filtered from those rows by data.music_index() rather than with a WHERE in the database
+# (it's faster than a round trip per click, and the rows are in memory for the unfiltered figures anyway)
+# to try it out, copy the bundled csv files into a database with:
+#     python data_sources.py build/data.db             (or build/data.duckdb)
+# settings (environment variables):
+#   SOURCE_POOL_SIZE - connections per database (default 4)
+#   SOURCE_THREADS   - how many loads fetch() runs at once (default 4)
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+SOURCE_POOL_SIZE = int(os.environ.get("SOURCE_POOL_SIZE", 4))
+SOURCE_THREADS = int(os.environ.get("SOURCE_THREADS", 4))
+
+_executor = None
+_executor_pid = None  # a forked process (a gunicorn worker) gets a copy of the executor without its threads
+_executor_lock = threading.Lock()
+
+
+def fetch(function, *args):
+    """
+    Run function(*args) on a background thread and return its Future - loading the datasets is mostly
+    waiting on files and databases, so several of them can load at once
+    (from async code, await asyncio.wrap_future(fetch(...)))
+    """
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(SOURCE_THREADS, thread_name_prefix="fetch")
+            _executor_pid = os.getpid()
+    return _executor.submit(function, *args)
+
+
+def shutdown():
+    """
+    Stop fetch()'s threads once the loads are done (the next fetch() starts new ones), do that before forking
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=True)
+        _executor = None
+
+
+class CsvSource:
+    """
+    Rows from a csv file, all the work happens in pandas
+    """
+
+    def __init__(self, path, exclude=(), **read_csv):
+        self.path = path
+        self.read_csv = dict(read_csv)
+        if exclude:
+            # excluded columns are skipped while the file is parsed
+            self.read_csv["usecols"] = lambda column: column not in exclude
+
+    def read(self, file=None):
+        """
+        Every row as a DataFrame (pass file to parse something other than self.path, like just the new rows)
+        """
+        return pd.read_csv(self.path if file is None else file, **self.read_csv)
+
+    def count_by(self, columns, fill=None):
+        counts = self.read().fillna(fill or {}).groupby(columns, sort=False).size()
+        return counts.reset_index(name="count")
+
+
+class ConnectionPool:
+    """
+    Up to `size` database connections, opened when first needed and handed out one thread at a time
+    """
+
+    def __init__(self, connect, size=SOURCE_POOL_SIZE):
+        self.connect = connect
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # connections can't cross a fork (gunicorn workers), so every process opens its own
+                self._idle, self._opened, self._pid = queue.LifoQueue(), 0, os.getpid()
+            opened = self._idle.empty() and self._opened < self.size
+            if opened:
+                self._opened += 1
+        try:
+            conn = self.connect() if opened else self._idle.get()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqlSource:
+    """
+    Rows from a database table, with group-by counts done by the database itself
+    """
+
+    def __init__(self, path, table, exclude=()):
+        self.path = path
+        self.table = table
+        self.exclude = set(exclude)
+        self.pool = ConnectionPool(self.connect)
+
+    def connect(self):
+        raise NotImplementedError
+
+    def query(self, sql, params=()):
+        raise NotImplementedError
+
+    def columns(self):
+        return [column for column in self.query(f"SELECT * FROM {quote(self.table)} LIMIT 0").columns
+                if column not in self.exclude]
+
+    def read(self, file=None):
+        # file is only there to look like CsvSource.read, a database is always read whole
+        return self.query(f"SELECT {', '.join(map(quote, self.columns()))} FROM {quote(self.table)} ORDER BY rowid")
+
+    def count_by(self, columns, fill=None):
+        """
+        Rows per combination of `columns`, counted in the database, with missing values counted as fill[column]
+        the groups come back in the order they first appear, like pandas groupby(sort=False)
+        """
+        fill = fill or {}
+        keys, params = [], []
+        for column in columns:
+            if column in fill:
+                keys.append(f"COALESCE({quote(column)}, ?)")
+                params.append(fill[column])
+            else:
+                keys.append(quote(column))
+        selected = ", ".join(f"{key} AS {quote(column)}" for key, column in zip(keys, columns))
+        # pandas leaves out groups with a missing key, so do the same
+        where = " AND ".join(f"{key} IS NOT NULL" for key in keys)
+        groups = ", ".join(str(i + 1) for i in range(len(columns)))
+        sql = (f"SELECT {selected}, COUNT(*) AS count FROM {quote(self.table)} WHERE {where} "
+               f"GROUP BY {groups} ORDER BY MIN(rowid)")
+        return self.query(sql, params + params)
+
+
+class SqliteSource(SqlSource):
+
+    def connect(self):
+        # read only, and shareable because the pool makes sure only one thread uses it at a time
+        return sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True, check_same_thread=False)
+
+    def query(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return pd.read_sql_query(sql, conn, params=list(params))
+
+
+class DuckDBSource(SqlSource):
+
+    def connect(self):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError(f"reading {self.path} needs DuckDB, install it with pip install duckdb") from None
+        return duckdb.connect(self.path, read_only=True)
+
+    def query(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, list(params)).df()
+
+
+SOURCE_TYPES = {"sqlite": SqliteSource, "duckdb": DuckDBSource}
+
+
+def open_source(spec, table, exclude=(), **read_csv):
+    """
+    The source for a spec like "data.csv" or "sqlite:data.db#table" (see the top of this file)
+    read_csv arguments only matter for csv files
+    """
+    kind, _, rest = spec.partition(":")
+    if kind not in SOURCE_TYPES:
+        return CsvSource(spec, exclude, **read_csv)
+    path, _, name = rest.partition("#")
+    return SOURCE_TYPES[kind](path, name or table, exclude)
+
+
+def write_database(path):
+    """
+    Copy the bundled csv files into an SQLite (or, for .duckdb files, DuckDB) database, as tables mxmh and whd
+    """
+    import data
+
+    tables = {"mxmh": pd.read_csv(data.MUSIC_CSV), "whd": pd.read_csv(data.WHD_CSV, encoding="utf-8-sig")}
+    if path.endswith(".duckdb"):
+        import duckdb
+
+        with duckdb.connect(path) as conn:
+            for name, df in tables.items():
+                conn.register("frame", df)
+                conn.execute(f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM frame")
+                conn.unregister("frame")
+    else:
+        with sqlite3.connect(path) as conn:
+            for name, df in tables.items():
+                df.to_sql(name, conn, if_exists="replace", index=False)
+    kind = "duckdb" if path.endswith(".duckdb") else "sqlite"
+    print(f"wrote {path}, use it with MUSIC_SOURCE={kind}:{path}#mxmh WHD_SOURCE={kind}:{path}#whd")
+
+
+if __name__ == "__main__":
+    import sys
+
+    write_database(sys.argv[1] if len(sys.argv) > 1 else os.path.join("build", "data.db"))
@@ -0,0 +1,114 @@
+# a tiny columnar store so every worker doesn't have to parse the csv files itself
+# the first time a dataset is loaded, its cleaned DataFrame is saved as one .npy file per column
+# (text columns are saved as category codes), and after that every process just memory-maps those files
+# memory-mapped pages are shared by the operating system, so 4 gunicorn workers hold one copy of the data, not 4
+# you can also convert everything up front with:
+#     python data_store.py
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from figure_cache import source_fingerprint
+
+# bump this if the on-disk layout or the cleaning rules in data.py change
+STORE_VERSION = 1
+# set DATA_STORE=off to always read the csv files directly
+STORE_DIR = os.environ.get("DATA_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "build", "store"))
+
+
+def store_path(name, source, categorical=()):
+    """
+    Folder a dataset is stored in - it changes whenever the source csv (or which columns are categories) does,
+    so old stores are never reused
+    """
+    key = json.dumps([STORE_VERSION, source_fingerprint([source]), sorted(categorical)])
+    return os.path.join(STORE_DIR, f"{name}-{hashlib.sha1(key.encode()).hexdigest()[:12]}")
+
+
+def save_frame(df, path, categorical=()):
+    """
+    Write a DataFrame as one .npy file per column plus a meta.json describing them
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(path))
+    frame = df.reset_index() if df.index.name is not None else df
+    columns = []
+    for i, (name, col) in enumerate(frame.items()):
+        entry = {"name": name, "file": f"{i}.npy"}
+        if col.dtype == object or isinstance(col.dtype, pd.CategoricalDtype):
+            # keep categories in the order they first appear, so plots color and stack things the same as before
+            values = col.array if isinstance(col.dtype, pd.CategoricalDtype) else \
+                pd.Categorical(col, categories=pd.unique(col.dropna()))
+            np.save(os.path.join(tmp, entry["file"]), values.codes)
+            entry["categories"] = values.categories.tolist()
+            entry["ordered"] = bool(values.ordered)
+            # columns that already were categories (like data.compact_music's) stay categories too
+            entry["categorical"] = name in categorical or isinstance(col.dtype, pd.CategoricalDtype)
+        else:
+            np.save(os.path.join(tmp, entry["file"]), col.to_numpy())
+        columns.append(entry)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"columns": columns, "index": df.index.name}, f)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # another worker finished converting the same csv first, theirs is just as good
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_frame(path):
+    """
+    Memory-map a stored DataFrame back in without copying the column data
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {}
+    for entry in meta["columns"]:
+        values = np.load(os.path.join(path, entry["file"]), mmap_mode="r")
+        if "categories" in entry:
+            dtype = pd.CategoricalDtype(entry["categories"], ordered=entry.get("ordered", False))
+            values = pd.Categorical.from_codes(values, dtype=dtype)
+            if not entry["categorical"]:
+                # free text columns go back to plain strings (these can't be shared between processes)
+                values = np.asarray(values, dtype=object)
+        columns[entry["name"]] = values
+    df = pd.DataFrame(columns, copy=False)
+    if meta["index"] is not None:
+        df = df.set_index(meta["index"])
+    return df
+
+
+def remove_stale(name, keep):
+    """
+    Delete stores for older versions of a dataset's csv
+    """
+    for entry in os.listdir(STORE_DIR):
+        path = os.path.join(STORE_DIR, entry)
+        if entry.startswith(f"{name}-") and path != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def cached_frame(name, source, prepare, categorical=()):
+    """
+    Load a dataset from the store, running prepare() and saving its result the first time
+    """
+    if STORE_DIR == "off":
+        return prepare()
+    path = store_path(name, source, categorical)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        save_frame(prepare(), path, categorical)
+        remove_stale(name, path)
+    return load_frame(path)
+
+
+if __name__ == "__main__":
+    import data
+
+    for load in [data.music, data.whd]:
+        df = load()
+        print(f"stored {load.__name__}: {len(df)} rows, {df.memory_usage(deep=True).sum() / 1024:.0f} KiB")
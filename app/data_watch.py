@@ -0,0 +1,143 @@
+# reloads the csv files while the app is running, so refreshing the survey data doesn't need a restart
+# (database files from data_sources.py too, those are always read again from the top)
+# a background thread in every worker checks the files every DATA_RELOAD_SECONDS seconds. when one changes:
+#   1. rows added to the end of the file are parsed on their own and added to the rows read last time
+#      (anything else, like an edited row, means reading the whole file again)
+#   2. data.next_snapshot() builds the new data next to the old one, along with every view computed from it
+#   3. the cached figures that used the old data are built again from the new snapshot
+#   4. then the new snapshot and figures are swapped in, requests that already started finish on the old data
+# only the dataset whose file changed is touched, everything else stays cached
+# settings (environment variables):
+#   DATA_RELOAD_SECONDS - how often to check the files (default 5), 0 turns reloading off
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+import data
+import data_sources
+import data_store
+import figure_pool
+import figures
+from figure_cache import source_fingerprint
+
+DATA_RELOAD_SECONDS = float(os.environ.get("DATA_RELOAD_SECONDS", 5))
+
+logger = logging.getLogger("dashboard")
+
+
+class SourceWatcher:
+    """
+    Keeps track of one csv file (one entry of data.RELOADABLE) and reloads it when it changes
+    """
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = spec
+        self.source = spec["source"]
+        self.path = self.source.path
+        self.stat = source_fingerprint([self.path])
+        self.pending = None  # a changed stat we've seen once, waiting for the file to stop changing
+        self.digest, self.size, self.ends_with_newline = self._read_state()
+        self.raw = None  # the parsed rows before cleaning, kept after the first reload so appends can reuse them
+
+    def _read_state(self, contents=None):
+        if contents is None:
+            try:
+                with open(self.path, "rb") as f:
+                    contents = f.read()
+            except OSError:
+                return None, 0, False
+        return hashlib.sha256(contents).hexdigest(), len(contents), contents.endswith(b"\n")
+
+    def check(self):
+        """
+        Reload the file if it changed (and has stopped changing since the last check), returns True if it did
+        """
+        stat = source_fingerprint([self.path])
+        if stat == self.stat:
+            self.pending = None
+            return False
+        if stat != self.pending:
+            # probably still being written, wait for the next check
+            self.pending = stat
+            return False
+        self.pending = None
+        self.stat = stat
+        with open(self.path, "rb") as f:
+            contents = f.read()
+        if hashlib.sha256(contents).hexdigest() == self.digest:
+            # touched, but nothing in it changed
+            return False
+        self.reload(contents)
+        return True
+
+    def parse(self, contents):
+        """
+        The raw rows of the new file, only parsing what was appended if that's all that changed
+        """
+        if not isinstance(self.source, data_sources.CsvSource):
+            # a database gets read again from the top
+            return self.source.read()
+        appended = (self.raw is not None and self.ends_with_newline and len(contents) > self.size
+                    and hashlib.sha256(contents[:self.size]).hexdigest() == self.digest)
+        if not appended:
+            return self.source.read(io.BytesIO(contents))
+        # the header line plus the new rows make a little csv of their own
+        header = contents[:contents.index(b"\n") + 1]
+        rows = self.source.read(io.BytesIO(header + contents[self.size:]))
+        logger.info("%s: %d rows appended", self.name, len(rows))
+        return pd.concat([self.raw, rows], ignore_index=True)
+
+    def reload(self, contents):
+        start = time.perf_counter()
+        parsed = []
+
+        def prepare():
+            raw = self.parse(contents)
+            parsed.append(raw)
+            return self.spec["clean"](raw.copy()) if self.spec["clean"] else raw
+
+        # another worker might have stored this version already, then there's nothing to parse
+        frame = data_store.cached_frame(self.name, self.path, prepare, self.spec["categorical"])
+        self.raw = parsed[0] if parsed else None
+        self.digest, self.size, self.ends_with_newline = self._read_state(contents)
+
+        snapshot = data.next_snapshot(self.path, {self.spec["loader"].cache_name: frame})
+        rebuilt = figures.rebuild_source(self.path, snapshot)
+        data.install(snapshot)
+        figures.install_figures(rebuilt)
+        # pool workers loaded the old data, the next pooled build starts fresh ones
+        figure_pool.shutdown()
+        logger.info("%s: reloaded %d rows and %d figures in %.2fs", self.name, len(frame), len(rebuilt),
+                    time.perf_counter() - start)
+
+
+_thread = None
+
+
+def watch(interval):
+    watchers = [SourceWatcher(name, spec) for name, spec in data.RELOADABLE.items()]
+    while True:
+        time.sleep(interval)
+        for watcher in watchers:
+            try:
+                watcher.check()
+            except Exception:
+                # a half-written or broken csv shouldn't kill the watcher, keep serving the old data
+                logger.exception("couldn't reload %s", watcher.path)
+
+
+def start(interval=DATA_RELOAD_SECONDS):
+    """
+    Start watching the csv files in this process (call it after forking, threads don't survive a fork)
+    """
+    global _thread
+    if interval <= 0 or (_thread is not None and _thread.is_alive()):
+        return
+    _thread = threading.Thread(target=watch, args=(interval,), name="data-watch", daemon=True)
+    _thread.start()
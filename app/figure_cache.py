@@ -0,0 +1,284 @@
+# this is a little cache for the figures that each dataset button shows
+# building plotly figures is by far the slowest part of clicking a button,
+# and the data behind them doesn't change while the app is running,
+# so we build each figure once and hand back the saved copy after that
+#
+# figures are serialized straight from fig.to_plotly_json() with orjson when it's installed (`pip install orjson`),
+# which understands numpy arrays natively and skips plotly's own cleaning pass over every value
+# settings (environment variables):
+#   FIGURE_JSON          - "orjson" (default when installed) or "plotly" for the plotly.io.to_json path
+#   FIGURE_TYPED_ARRAYS  - "1" to send numeric arrays as base64 typed arrays, which are smaller and faster to parse,
+#                          but need plotly.js 2.28 or newer in the browser (so it's off by default)
+import base64
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.io as pio
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FIGURE_JSON = os.environ.get("FIGURE_JSON", "orjson" if orjson is not None else "plotly")
+FIGURE_TYPED_ARRAYS = os.environ.get("FIGURE_TYPED_ARRAYS", "0") == "1"
+# arrays shorter than this stay as plain lists, the base64 wrapper isn't worth it for a handful of numbers
+TYPED_ARRAY_MIN_LENGTH = 32
+
+# numpy dtype -> plotly.js typed array dtype
+TYPED_ARRAY_DTYPES = {"int8": "i1", "uint8": "u1", "int16": "i2", "uint16": "u2",
+                      "int32": "i4", "uint32": "u4", "float32": "f4", "float64": "f8"}
+
+
+def typed_array(array):
+    """
+    A numeric numpy array as a plotly.js typed array spec, or None if it should stay a plain list
+    """
+    if array.dtype.kind not in "iuf" or array.size < TYPED_ARRAY_MIN_LENGTH or array.ndim > 2:
+        return None
+    if array.dtype.kind == "f" and array.size and np.isfinite(array).all() and (array == np.round(array)).all():
+        # most survey columns are whole numbers stored as floats, and those pack much tighter as integers
+        array = array.astype(np.int64)
+    elif array.dtype == np.float64 and np.allclose(array.astype(np.float32), array, rtol=1e-6, atol=0, equal_nan=True):
+        # short decimals like 2.5 hours don't need 64 bits, 32 bit floats keep more digits than a hover label shows
+        array = array.astype(np.float32)
+    if array.dtype.kind in "iu":
+        # use the smallest integer type that fits, plotly.js has no 64 bit integers so those fall back to floats
+        low, high = (array.min(), array.max()) if array.size else (0, 0)
+        for dtype in (np.int8, np.int16, np.int32):
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                array = array.astype(dtype)
+                break
+        else:
+            array = array.astype(np.float64)
+    spec = {"dtype": TYPED_ARRAY_DTYPES[array.dtype.name],
+            "bdata": base64.b64encode(np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))).decode()}
+    if array.ndim == 2:
+        spec["shape"] = f"{array.shape[0]},{array.shape[1]}"
+    return spec
+
+
+def encode_typed_arrays(value):
+    """
+    Swap every big numeric numpy array inside a figure dict for its typed array spec
+    """
+    if isinstance(value, dict):
+        return {key: encode_typed_arrays(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_typed_arrays(item) for item in value]
+    if isinstance(value, np.ndarray):
+        spec = typed_array(value)
+        if spec is not None:
+            return spec
+    return value
+
+
+def _orjson_default(obj):
+    # orjson hands us whatever it can't encode by itself: object/string arrays, dates and numpy scalars
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == "M":
+            return np.datetime_as_string(obj).tolist()
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"can't serialize {type(obj).__name__} in a figure")
+
+
+def parse_json(text):
+    """
+    JSON text back into plain python objects, with orjson when we have it
+    """
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def serialize_figure(fig):
+    """
+    Turn a figure into its JSON text and the plain dict Dash sends to the browser
+    """
+    if FIGURE_JSON != "orjson":
+        text = pio.to_json(fig, validate=False)
+        return text, json.loads(text)
+    # this only skips the encoder's pass over every value (pio.to_json above doesn't validate either),
+    # the figures are still checked by px/go.Figure while they're built
+    figure = fig.to_plotly_json()
+    if FIGURE_TYPED_ARRAYS:
+        figure = encode_typed_arrays(figure)
+    text = orjson.dumps(figure, default=_orjson_default,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+    return text, parse_json(text)
+
+
+def source_fingerprint(paths):
+    """
+    Cheap fingerprint of the source files (size + modified time) a dataset was built from
+    """
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+
+class FigureCache:
+    """
+    Size-bounded LRU cache of pre-serialized figures, keyed by (dataset, panel)
+    """
+
+    def __init__(self, max_size=40, fingerprint=source_fingerprint, sources=None):
+        self.max_size = max_size
+        # fingerprint(paths) tells what version of the source files a figure was built from,
+        # a cached figure whose fingerprint doesn't match anymore counts as a miss
+        self.fingerprint = fingerprint
+        # sources((dataset, panel)) gives the source files of figures nobody watch()ed, for datasets that come and go
+        self.sources = sources
+        self._figures = OrderedDict()  # (dataset, panel) -> [fingerprint, json text, figure dict]
+        # (dataset, panel) -> list of source files it was built from
+        # keys can have more after the (dataset, panel), like a cross-filter, and share its sources
+        self._sources = {}
+        self._building = {}  # key -> threading.Event set once the figure someone is building is in the cache
+        self._lock = threading.Lock()
+
+    def watch(self, key, *paths):
+        """
+        Remember which source files a figure depends on, so changes to them can invalidate it
+        """
+        self._sources[key] = list(paths)
+
+    def _paths(self, key):
+        paths = self._sources.get(key[:2])
+        if paths is None and self.sources is not None:
+            paths = self.sources(key[:2])
+        return paths or []
+
+    def get(self, key, build):
+        """
+        Return the figure dict for a key, calling build() only on a miss
+        """
+        return self._entry(key, build)[2]
+
+    def get_json(self, key, build):
+        """
+        Same as get(), but return the pre-serialized JSON text of the figure
+        """
+        entry = self._entry(key, build)
+        if entry[1] is None:
+            # figures stored with put() only carry the dict, so serialize it the first time it's asked for
+            entry[1] = json.dumps(entry[2])
+        return entry[1]
+
+    def put(self, key, figure, text=None, fingerprint=None):
+        """
+        Store an already-built figure dict (e.g. one loaded from the precomputed artifact)
+        pass the fingerprint from before the figure was built if the sources might have changed since
+        """
+        if fingerprint is None:
+            fingerprint = self.fingerprint(self._paths(key))
+        self._store(key, [fingerprint, text, figure])
+        return figure
+
+    def __contains__(self, key):
+        return self._fresh(key) is not None
+
+    def _fresh(self, key):
+        fingerprint = self.fingerprint(self._paths(key))
+        with self._lock:
+            entry = self._figures.get(key)
+            if entry is None:
+                return None
+            if entry[0] != fingerprint:
+                # built from an older version of the data
+                del self._figures[key]
+                return None
+            self._figures.move_to_end(key)
+            return entry
+
+    def _entry(self, key, build):
+        entry = self._fresh(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            building = self._building.get(key)
+            if building is None:
+                self._building[key] = threading.Event()
+        if building is not None:
+            # someone else is building this figure right now, wait for theirs instead of building it twice
+            building.wait()
+            return self._entry(key, build)
+        try:
+            return self._fresh(key) or self._build(key, build)
+        finally:
+            with self._lock:
+                self._building.pop(key).set()
+
+    def _build(self, key, build):
+        # build outside of the lock so one slow figure doesn't block the others
+        dataset, panel = key[:2]
+        fingerprint = self.fingerprint(self._paths(key))
+        with metrics.timed("dashboard_figure_build_seconds", dataset=dataset, figure=panel):
+            fig = build()
+        with metrics.timed("dashboard_figure_serialize_seconds", dataset=dataset, figure=panel):
+            text, figure = serialize_figure(fig)
+        metrics.observe("dashboard_figure_bytes", len(text), dataset=dataset, figure=panel)
+        entry = [fingerprint, text, figure]
+        self._store(key, entry)
+        return entry
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._figures[key] = entry
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_size:
+                self._figures.popitem(last=False)
+
+    def stale(self):
+        """
+        List the cached figures whose source files changed since they were built
+        """
+        with self._lock:
+            entries = list(self._figures.items())
+        return [key for key, (fingerprint, _, _) in entries
+                if fingerprint != self.fingerprint(self._paths(key))]
+
+    def invalidate(self, key=None):
+        """
+        Drop one figure from the cache, or everything if no key is given
+        """
+        with self._lock:
+            if key is None:
+                self._figures.clear()
+            else:
+                self._figures.pop(key, None)
+
+    def invalidate_dataset(self, dataset):
+        """
+        Drop every panel of one dataset
+        """
+        with self._lock:
+            for key in [key for key in self._figures if key[0] == dataset]:
+                del self._figures[key]
+
+    def built_from(self, path):
+        """
+        The cached figures that were built from one source file
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            keys = list(self._figures)
+        return [key for key in keys if path in (os.path.abspath(p) for p in self._paths(key))]
+
+    def invalidate_source(self, path):
+        """
+        Hook to call when a source CSV changes: drops every figure built from it
+        """
+        for key in self.built_from(path):
+            self.invalidate(key)
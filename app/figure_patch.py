@@ -0,0 +1,65 @@
+# when the browser already shows a figure with the same traces (like whd15 -> whd19), most of the figure
+# (layout, colorscales, trace settings) is identical, so we only send the parts that changed
+# the changes go out as a Dash Patch, see https://dash.plotly.com/partial-properties
+# set FIGURE_PATCHES=0 to always send whole figures
+import os
+
+from dash import Patch
+
+FIGURE_PATCHES = os.environ.get("FIGURE_PATCHES", "1") == "1"
+
+# marks a key that's in the old figure but not the new one
+DELETE = object()
+
+
+def same_structure(old, new):
+    """
+    True if both figures have the same number of traces, of the same types, so patching one into the other makes sense
+    """
+    old_traces, new_traces = old.get("data", []), new.get("data", [])
+    return (len(old_traces) == len(new_traces)
+            and all(a.get("type") == b.get("type") for a, b in zip(old_traces, new_traces)))
+
+
+def diff(old, new, path=()):
+    """
+    List of (path, new value) changes that turn old into new, with DELETE as the value for removed keys
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = [(path + (key,), DELETE) for key in old if key not in new]
+        for key, value in new.items():
+            if key not in old:
+                changes.append((path + (key,), value))
+            elif old[key] != value:
+                changes.extend(diff(old[key], value, path + (key,)))
+        return changes
+    if (isinstance(old, list) and isinstance(new, list) and len(old) == len(new)
+            and all(isinstance(item, dict) for item in old + new)):
+        # lists of traces / annotations / shapes: look inside each one instead of replacing the whole list
+        changes = []
+        for index, (a, b) in enumerate(zip(old, new)):
+            if a != b:
+                changes.extend(diff(a, b, path + (index,)))
+        return changes
+    return [(path, new)]
+
+
+def figure_patch(old, new):
+    """
+    A Patch that turns figure old into figure new, or None if they're too different to patch
+    """
+    if not same_structure(old, new):
+        return None
+    changes = diff(old, new)
+    if any(not path for path, _ in changes):
+        return None
+    patch = Patch()
+    for path, value in changes:
+        target = patch
+        for key in path[:-1]:
+            target = target[key]
+        if value is DELETE:
+            del target[path[-1]]
+        else:
+            target[path[-1]] = value
+    return patch
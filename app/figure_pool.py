@@ -0,0 +1,139 @@
+# builds several figures at the same time instead of one after another
+# plotly express and the JSON encoding are mostly pure python, so threads don't help much because of the GIL,
+# which is why the default is a small pool of worker processes
+# the workers aren't forked from the app itself (forking a process with other threads running, like gunicorn's or
+# data_watch.py's, can leave a lock held forever in the child), they come from a forkserver that has imported
+# figures.py and nothing else, and load the data themselves (from the data store, see data_store.py)
+# so the first pooled build after the pool starts (and after every reload, see data_watch.py) waits for that,
+# python -m benchmarks.pool shows how long it takes next to threads and building serially
+# thread workers read from the same data snapshot as the request that handed them the figures (see data.pinned)
+# settings (environment variables):
+#   FIGURE_POOL     - "process" (default), "thread", or "serial" to turn the pool off
+#   FIGURE_WORKERS  - how many figures to build at once (default: one per cpu, at most one per panel)
+# if the pool can't be started or breaks, figures are built one at a time on the request thread like before
+# a process that forks (gunicorn's main process with preload_app) should call shutdown(forkserver=True) first,
+# and a forked process forgets the pool it was copied with and starts its own when it needs one
+import logging
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import data
+
+FIGURE_POOL = os.environ.get("FIGURE_POOL", "process")
+FIGURE_WORKERS = int(os.environ.get("FIGURE_WORKERS", min(5, os.cpu_count() or 1)))
+# what the forkserver imports before it forks any workers, so each one starts with the figure code ready
+PRELOAD = ["figures"]
+
+logger = logging.getLogger("dashboard")
+
+_pool = None
+_pool_pid = None  # gunicorn forks workers after importing the app, so each worker needs its own pool
+_disabled = FIGURE_POOL == "serial" or FIGURE_WORKERS < 2
+_in_worker = False
+_lock = threading.Lock()
+
+
+def _mark_worker():
+    # worker processes build their figures serially, they should never start pools of their own
+    global _in_worker
+    _in_worker = True
+
+
+def process_context():
+    """
+    The multiprocessing context worker processes start from: a forkserver, or spawn where there's no such thing
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(PRELOAD)
+    return context
+
+
+def get_pool():
+    """
+    The shared executor, started on first use, or None if figures should be built serially
+    """
+    global _pool, _pool_pid, _disabled
+    if _disabled or _in_worker:
+        return None
+    with _lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            return _pool
+        try:
+            if FIGURE_POOL == "thread":
+                _pool = ThreadPoolExecutor(FIGURE_WORKERS, thread_name_prefix="figure")
+            else:
+                _pool = ProcessPoolExecutor(FIGURE_WORKERS, mp_context=process_context(), initializer=_mark_worker)
+        except (OSError, ValueError, NotImplementedError) as e:
+            logger.warning("couldn't start the figure pool (%s), building figures serially", e)
+            _disabled = True
+            return None
+        _pool_pid = os.getpid()
+        return _pool
+
+
+def run_all(function, jobs):
+    """
+    Call function(*job) for every job, in the pool if there is one, and return the results in order
+    jobs should be small and picklable (like (dataset, panel) tuples) rather than the functions themselves
+    """
+    jobs = list(jobs)
+    pool = get_pool() if len(jobs) > 1 else None
+    if pool is None:
+        return [function(*job) for job in jobs]
+    try:
+        if isinstance(pool, ThreadPoolExecutor):
+            # the snapshot pin is per thread, so hand the caller's snapshot over to the pool's threads
+            snapshot = data.current_snapshot()
+            futures = [pool.submit(_pinned_call, snapshot, function, job) for job in jobs]
+        else:
+            futures = [pool.submit(function, *job) for job in jobs]
+        return [future.result() for future in futures]
+    except (BrokenProcessPool, RuntimeError, OSError) as e:
+        # a worker died (or the pool was shut down under us, or couldn't start its processes),
+        # so give up on it and finish the job ourselves
+        logger.warning("figure pool failed (%s), building figures serially from now on", e)
+        shutdown(disable=True)
+        return [function(*job) for job in jobs]
+
+
+def _pinned_call(snapshot, function, job):
+    with data.pinned(snapshot):
+        return function(*job)
+
+
+def shutdown(disable=False, forkserver=False):
+    """
+    Stop the pool's workers, and optionally never start another one
+    forkserver=True stops the forkserver they came from too (it outlives the pool otherwise), do that before forking
+    """
+    global _pool, _disabled
+    with _lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=True if forkserver else False, cancel_futures=True)
+        _pool = None
+        _disabled = _disabled or disable
+        if forkserver and "forkserver" in multiprocessing.get_all_start_methods():
+            multiprocessing.forkserver._forkserver._stop()
+
+
+def _after_fork():
+    # the forked process has a copy of the pool (and of multiprocessing's forkserver) but none of its processes
+    # or threads, so forget both: the next pooled build starts a forkserver and a pool of this process's own
+    global _pool, _lock
+    _pool = None
+    _lock = threading.Lock()
+    server = multiprocessing.forkserver._forkserver
+    if server._forkserver_alive_fd is not None:
+        # keeping the parent's end open would keep the parent's forkserver running after the parent stops it
+        os.close(server._forkserver_alive_fd)
+    server._forkserver_alive_fd = server._forkserver_address = server._forkserver_pid = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,508 @@
+# time to create figures
+# every dataset has one function per panel, and the panels at the bottom (see panels.py) say which is which
+# FIGURE_BUILDERS maps dataset -> panel -> function, made from those panels
+# if you add a new dataset button, write its panel functions and add them to each panel at the bottom
+# Please be *very* careful with changing the panel names, as they are the first part of the graph IDs in appv1.py
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Mapping
+from functools import partial
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+import aggregate
+import data
+import data_sources
+import figure_patch
+import figure_pool
+import frames
+import metrics
+import panels
+import precompute
+from figure_cache import FigureCache, parse_json, serialize_figure
+
+# how many datasets' worth of figures to keep cached in memory at once
+FIGURE_CACHE_DATASETS = 8
+
+
+# treemaps and sunbursts are drawn from hierarchies rolled up once by aggregate.hierarchy_table,
+# instead of letting px.treemap/px.sunburst roll up the raw rows on every build
+def hierarchy_figure(trace, boxes, values, color, hover=()):
+    """
+    A go.Treemap or go.Sunburst (pass the class as trace) from a hierarchy table, colored like px does it
+    """
+    hovertemplate = f"%{{label}}<br>{values}=%{{value}}<br>{color}=%{{color}}"
+    hovertemplate += "".join(f"<br>{name}=%{{customdata[{i}]}}" for i, name in enumerate(hover))
+    fig = go.Figure(trace(ids=boxes["id"], parents=boxes["parent"], labels=boxes["label"], values=boxes["value"],
+                          branchvalues="total", marker=dict(colors=boxes["color"], coloraxis="coloraxis"),
+                          customdata=boxes[list(hover)] if hover else None,
+                          hovertemplate=hovertemplate + "<extra></extra>"))
+    # the middle of the color scale sits at the overall weighted average, same as np.average(..., weights=...)
+    top = boxes[boxes["parent"] == ""]
+    fig.update_layout(coloraxis=dict(colorscale=px.colors.sequential.RdBu, colorbar=dict(title=dict(text=color)),
+                                     cmid=np.average(top["color"], weights=top["value"])),
+                      margin=dict(t=60))
+    return fig
+
+
+# the music / mental health figures
+# each one can also be drawn for just some of the survey answers (pass them as musicdf, see crossfilter.py)
+def mxmh_main(musicdf=None):
+    mainFig = go.Figure()
+    # one violin per score, split by whether music helps or hurts
+    # on big datasets aggregate.violin_points boils each violin down to a quantile sketch
+    effectsdf = data.music_with_effects() if musicdf is None else data.with_effects(musicdf)
+    for score, color in [('Depression', 'hotpink'), ('Anxiety', 'green'), ('OCD', 'blue'), ('Insomnia', 'purple')]:
+        x, y = aggregate.violin_points(effectsdf['Music effects'], effectsdf[score])
+        mainFig.add_trace(go.Violin(x=x, y=y,
+                                    legendgroup=f'{score}/10', scalegroup=f'{score}/10', name=f'{score}/10',
+                                    line_color=color, box_visible=True)
+                          )
+    mainFig.update_traces(meanline_visible=True)
+    mainFig.update_layout(violingap=0, violinmode='group')
+    mainFig.update_layout(yaxis_title="Self-Ranked Score Out of 10",
+                          xaxis_title="Music Tends to ______ My Mental Health")
+    return mainFig
+
+
+def mxmh_histo(musicdf=None):
+    musicdf = data.music() if musicdf is None else musicdf
+    if aggregate.should_aggregate(musicdf):
+        # send one bar per genre/effect instead of every survey answer
+        # (the whole survey's counts come from data.music_counts, which a database source counts by itself)
+        counts = data.music_counts("Fav genre", "Music effects") if musicdf is data.music() else \
+            aggregate.count_table(musicdf, "Fav genre", "Music effects")
+        histoFig = px.bar(counts, x="Fav genre", y="count",
+                          color="Music effects", color_discrete_sequence=px.colors.qualitative.Prism)
+    else:
+        histoFig = px.histogram(musicdf, x="Fav genre", histfunc='count', color="Music effects",
+                                color_discrete_sequence=px.colors.qualitative.Prism)
+    histoFig.update_layout(yaxis_title="Number of People")
+    return histoFig
+
+
+def mxmh_dense(musicdf=None):
+    musicdf = data.music() if musicdf is None else musicdf
+    if aggregate.is_large(musicdf):
+        # bin the heatmap with numpy here, so the browser only gets one number per cell
+        table, xbins, ybins = aggregate.hist2d_table(musicdf, "Depression", "Anxiety", 10, 10,
+                                                     facets=["Composer", "Instrumentalist"])
+        denseFig = px.density_heatmap(table, x="Depression", y="Anxiety", z="count", histfunc="sum",
+                                      facet_row="Composer", facet_col="Instrumentalist")
+        denseFig.update_traces(xbins=xbins, ybins=ybins, autobinx=False, autobiny=False)
+    else:
+        denseFig = px.density_heatmap(musicdf, x="Depression", y="Anxiety", nbinsx=10, nbinsy=10, facet_row="Composer",
+                                      facet_col="Instrumentalist")
+    return denseFig
+
+
+def mxmh_scatter(musicdf=None):
+    musicdf = data.music() if musicdf is None else musicdf
+    if aggregate.is_large(musicdf):
+        # one marker per grid cell instead of one per person (hover to see how many people are in it)
+        scatterFig = px.scatter_ternary(aggregate.ternary_table(musicdf, "OCD", "Anxiety", "Insomnia",
+                                                                "Mental health severity", color="Exploratory"),
+                                        a="OCD", b="Anxiety", c="Insomnia", color="Exploratory",
+                                        size="Mental health severity", size_max=20, hover_data=["count"],
+                                        color_discrete_sequence=px.colors.qualitative.Prism)
+    else:
+        scatterFig = px.scatter_ternary(musicdf, a="OCD", b="Anxiety", c="Insomnia", color="Exploratory",
+                                        size="Mental health severity", size_max=20,
+                                        color_discrete_sequence=px.colors.qualitative.Prism)
+    return scatterFig
+
+
+@data.snapshot_cache(data.MUSIC_FILE)
+def mxmh_hierarchy():
+    return mxmh_boxes(data.music())
+
+
+def mxmh_boxes(musicdf):
+    return aggregate.hierarchy_table(musicdf, ['Primary streaming service', 'Exploratory'], 'Hours per day')
+
+
+def mxmh_pie(musicdf=None):
+    boxes = mxmh_hierarchy() if musicdf is None else mxmh_boxes(musicdf)
+    # every streaming service gets its own color, and its Yes/No boxes share it
+    services = boxes["id"].str.split("/", n=1).str[0]
+    palette = dict(zip(services.unique(), px.colors.sequential.Plasma * len(services)))
+    pieFig = go.Figure(go.Sunburst(ids=boxes["id"], parents=boxes["parent"], labels=boxes["label"],
+                                   values=boxes["value"], branchvalues="total",
+                                   marker=dict(colors=services.map(palette)),
+                                   hovertemplate="%{label}<br>Hours per day=%{value}<extra></extra>"))
+    pieFig.update_layout(margin=dict(t=60))
+    return pieFig
+
+
+# the world happiness figures for a single year
+# these take the year to show, so every year in WHD.csv shares the same code
+def whd_year_histo(year):
+    whdyeardf = data.whd_year(year)
+    if aggregate.should_aggregate(whdyeardf):
+        table, width = aggregate.binned_table(whdyeardf, "Happiness Score", 'Health (Life Expectancy)', 'avg',
+                                              color="Region")
+        histoFig = px.bar(table, x="Happiness Score", y='Health (Life Expectancy)',
+                          color="Region", color_discrete_sequence=px.colors.sequential.Plasma)
+        histoFig.update_traces(width=width)
+    else:
+        histoFig = px.histogram(whdyeardf, x="Happiness Score", y='Health (Life Expectancy)', histfunc='avg',
+                       color="Region", color_discrete_sequence=px.colors.sequential.Plasma)
+    return histoFig
+
+
+def whd_year_scatter(year):
+    whdyeardf = data.whd_year(year)
+    # only the happier countries, picked out of the year's slice (a mask, not a NaN-filled copy of every row)
+    happydf = whdyeardf[whdyeardf["Happiness Score"].to_numpy() > 5]
+    scatterFig = px.scatter_3d(happydf,
+                               x="Economy (GDP per Capita)", y="Trust (Government Corruption)", z="Freedom",
+                               color='Region', hover_name=happydf.index,
+                               hover_data=['Economy (GDP per Capita)', 'Family',
+                                           'Health (Life Expectancy)', 'Freedom',
+                                           'Trust (Government Corruption)',
+                                           'Generosity'], color_discrete_sequence=px.colors.sequential.Plasma)
+    return scatterFig
+
+
+def whd_year_main(year):
+    whdyeardf = data.whd_year(year)
+    # draw the floor plan fig
+    mainFig = px.choropleth(whdyeardf, locations="iso_alpha",
+                    color="Happiness Score", fitbounds='locations',
+                    hover_name=whdyeardf.index, hover_data=['Economy (GDP per Capita)', 'Family',
+                                                      'Health (Life Expectancy)', 'Freedom',
+                                                      'Trust (Government Corruption)', 'Generosity'],
+                    color_continuous_scale=px.colors.sequential.RdBu)
+    mainFig.update_layout(margin=dict(l=0, r=0, t=0, b=0),
+                          legend=dict(orientation='h', y=-0.1, yanchor='bottom', x=0.5, xanchor='center'))
+    return mainFig
+
+
+@data.snapshot_cache(data.WHD_FILE)
+def whd_year_hierarchy(year, root=None):
+    # region -> country, sized by happiness ratio and colored by the (ratio weighted) happiness score
+    return aggregate.hierarchy_table(data.whd_year(year).reset_index(), ['Region', 'Country'], 'Happiness Ratio',
+                                     color='Happiness Score', root=root)
+
+
+def whd_year_dense(year):
+    # draw the figure that counts instances of a component being the max consumer
+    denseFig = hierarchy_figure(go.Treemap, whd_year_hierarchy(year, "world"), 'Happiness Ratio', 'Happiness Score')
+    denseFig.update_layout(margin = dict(t=50, l=25, r=25, b=25))
+    return denseFig
+
+
+def whd_year_pie(year):
+    # draw the figure that counts instances of a component being the hottest
+    return hierarchy_figure(go.Sunburst, whd_year_hierarchy(year), 'Happiness Ratio', 'Happiness Score')
+
+
+# the world happiness figures for every year at once, animated by year
+def whd_main():
+    whddf = data.whd()
+    mainFig = px.choropleth(whddf, locations="iso_alpha",
+                    color="Happiness Score", fitbounds='locations',
+                    hover_name="Country", hover_data=['Economy (GDP per Capita)', 'Family',
+                                                      'Health (Life Expectancy)', 'Freedom',
+                                                      'Trust (Government Corruption)', 'Generosity'],
+                    color_continuous_scale=px.colors.sequential.RdBu, animation_frame="Year")
+    mainFig.update_layout(margin=dict(l=0, r=0, t=0, b=0),
+                          legend=dict(orientation='h', y=-0.1, yanchor='bottom', x=0.5, xanchor='center'))
+    return mainFig
+
+
+def whd_histo():
+    whddf = data.whd()
+    if aggregate.should_aggregate(whddf):
+        table, width = aggregate.binned_table(whddf, "Happiness Score", color="Region", frame="Year")
+        histoFig = px.bar(table.sort_values("Year"), x="Happiness Score", y="count", color="Region",
+                          color_discrete_sequence=px.colors.sequential.Plasma,
+                          animation_frame="Year")
+        histoFig.update_traces(width=width)
+    else:
+        histoFig = px.histogram(whddf, x="Happiness Score", histfunc='count', color="Region",
+                       color_discrete_sequence=px.colors.sequential.Plasma,
+                       animation_frame="Year")
+    histoFig.update_layout(yaxis_title="Number of Countries")
+    return histoFig
+
+
+def whd_scatter():
+    whddf = data.whd()
+    if aggregate.is_large(whddf):
+        scatterFig = px.scatter_ternary(aggregate.ternary_table(whddf, "Generosity", "Trust (Government Corruption)",
+                                                                "Freedom", "Happiness Score", color="Region",
+                                                                frame="Year").sort_values("Year"),
+                                        a="Generosity", b="Trust (Government Corruption)", c="Freedom",
+                                        color="Region", size="Happiness Score", size_max=15, hover_data=["count"],
+                                        animation_frame="Year", color_discrete_sequence=px.colors.sequential.Plasma)
+    else:
+        scatterFig = px.scatter_ternary(whddf, a="Generosity", b="Trust (Government Corruption)", c="Freedom",
+                             hover_name="Country", color="Region", size="Happiness Score", size_max=15,
+                             hover_data=['Happiness Score', 'Economy (GDP per Capita)', 'Family',
+                                                          'Health (Life Expectancy)', 'Freedom',
+                                                          'Trust (Government Corruption)', 'Generosity'],
+                             animation_frame="Year", color_discrete_sequence=px.colors.sequential.Plasma)
+    return scatterFig
+
+
+@data.snapshot_cache(data.WHD_FILE)
+def whd_hierarchy(values, hover=(), root=None):
+    # every year rolled into one box per country
+    return aggregate.hierarchy_table(data.whd(), ['Region', 'Country'], values, color='Happiness Score',
+                                     hover=hover, root=root)
+
+
+def whd_dense():
+    denseFig = hierarchy_figure(go.Treemap, whd_hierarchy('Economy (GDP per Capita)', root="world"),
+                                'Economy (GDP per Capita)', 'Happiness Score')
+    denseFig.update_layout(margin = dict(t=50, l=25, r=25, b=25))
+    return denseFig
+
+
+def whd_pie():
+    return hierarchy_figure(go.Sunburst, whd_hierarchy('Trust (Government Corruption)', hover=('iso_alpha',)),
+                            'Trust (Government Corruption)', 'Happiness Score', hover=('iso_alpha',))
+
+
+# the panels on the page, top to bottom - appv1.py lays them out and makes their callbacks from these
+# the mxmh functions also take a DataFrame, for drawing the cross-filtered music survey (see crossfilter.py)
+panels.register(panels.Panel(
+    "histo", "Histogram Example", row=0, height=150,
+    figures={"mxmh": mxmh_histo, "whd_year": whd_year_histo, "whd": whd_histo},
+    info="""
+            The _**Histogram example**_ panel displays an example of the Histogram plot. You can edit this panel to
+            contain information that is relevant to the plot you created. 
+            
+            [You can learn more about Histograms at this link](https://plotly.com/python/histograms/).
+            """))
+panels.register(panels.Panel(
+    "dense", "Density Map Example", row=0,
+    figures={"mxmh": mxmh_dense, "whd_year": whd_year_dense, "whd": whd_dense},
+    info="""
+            The _**Density map example **_ panel displays an example of the Density map plot. You can edit this panel to
+            contain information that is relevant to the plot you created. 
+            
+            [You can learn more about Density Map plots at this link](https://plotly.com/python/2D-Histogram/).
+            """))
+panels.register(panels.Panel(
+    "main", "Main Plot Example", row=1, modebar=True,
+    figures={"mxmh": mxmh_main, "whd_year": whd_year_main, "whd": whd_main},
+    info="""
+            The _**Main plot example **_ panel displays an example of a larger plot within the scheme of the app. 
+            You can edit this panel to contain information that is relevant to the plot you created. 
+            
+            [Plotly has all sorts of examples for plots, you can see all of them here.](https://plotly.com/python/plotly-express/).
+            """))
+panels.register(panels.Panel(
+    "pie", "Pie Example", row=2, modal_side="top",
+    figures={"mxmh": mxmh_pie, "whd_year": whd_year_pie, "whd": whd_pie},
+    info="""
+            The _**Pie example **_ panel displays an example of a Pie plot. You can edit this panel to
+            contain information that is relevant to the plot you created. 
+            
+            [You can learn more about Pie plots at this link](https://plotly.com/python/sunburst-charts/).
+        """))
+panels.register(panels.Panel(
+    "scatter", "Scatter Example", row=2, modal_side="top",
+    figures={"mxmh": mxmh_scatter, "whd_year": whd_year_scatter, "whd": whd_scatter},
+    info="""
+            The _**Scatter example **_ panel displays an example of a Scatter plot. You can edit this panel to
+            contain information that is relevant to the plot you created. 
+            
+            [You can learn more about Scatter plots at this link](https://plotly.com/python/line-and-scatter/).
+        """))
+
+# the panels' ids, in the order the dataset callbacks return them
+PANELS = panels.ids()
+
+
+def whd_year_builders(year):
+    return {panel.id: partial(panel.figures["whd_year"], year) for panel in panels.REGISTRY}
+
+
+def whd_year_datasets():
+    """
+    Every year in WHD.csv gets its own dataset id, like whd15 for 2015: {dataset id: year}
+    """
+    # read from the data as it is now, so a year added to (or taken out of) the csv shows up after data_watch.py
+    # reloads it, and nothing has to load WHD.csv when the app is imported
+    return {f"whd{year % 100:02d}": year for year in data.whd_years()}
+
+
+class FigureBuilders(Mapping):
+    """
+    Maps each dataset id to the functions that build its figures, {dataset: {panel: function}}
+    """
+    # "mxmh" and "whd" are always there, the single-year datasets are whatever whd_year_datasets() says right now
+    # (so asking whether "mxmh" is a dataset doesn't load WHD.csv, and a year that's gone is just a missing key)
+
+    def __getitem__(self, dataset):
+        if dataset in ("mxmh", "whd"):
+            return {panel.id: panel.figures[dataset] for panel in panels.REGISTRY}
+        return whd_year_builders(whd_year_datasets()[dataset])
+
+    def __iter__(self):
+        return iter(["mxmh", *whd_year_datasets(), "whd"])
+
+    def __len__(self):
+        return len(whd_year_datasets()) + 2
+
+
+# if you add a new button, add its figure functions to the panels above too
+FIGURE_BUILDERS = FigureBuilders()
+
+
+def sources(dataset):
+    """
+    The csv files a dataset is built from (every single-year dataset comes from WHD.csv)
+    """
+    return data.SOURCES.get(dataset, [data.WHD_FILE])
+
+
+def build_bundle(dataset):
+    """
+    Build every panel's figure for a dataset from scratch (no caching)
+    """
+    return tuple(FIGURE_BUILDERS[dataset][panel]() for panel in PANELS)
+
+
+# figures get built once and then served from this cache
+# each figure remembers which version of its csv files it was built from (see data.source_versions),
+# so when data_watch.py reloads a file, the figures built from the old data stop counting as cached
+figure_cache = FigureCache(max_size=FIGURE_CACHE_DATASETS * len(PANELS), fingerprint=data.source_versions,
+                           sources=lambda key: sources(key[0]))
+
+
+def load_precomputed(dataset):
+    """
+    Copy a dataset's figures from the precomputed artifact into the cache, if they're in there
+    """
+    if any(data.source_versions(sources(dataset))):
+        # the artifact was built from the csv files as they were before they got reloaded
+        return
+    bundle = precompute.load_bundle(dataset)
+    if bundle is not None:
+        for panel, figure in zip(PANELS, bundle):
+            figure_cache.put((dataset, panel), figure)
+
+
+def get_full_figure(dataset, panel):
+    """
+    One panel's figure: from the cache, then the precomputed artifact, and only then built from scratch
+    """
+    key = (dataset, panel)
+    # pinned, so a reload that lands halfway through can't mix old and new data in one figure
+    with data.pinned():
+        if key not in figure_cache:
+            load_precomputed(dataset)
+        return figure_cache.get(key, FIGURE_BUILDERS[dataset][panel])
+
+
+def data_version(dataset):
+    """
+    The version of a dataset's csv files as one string, like "0" (it goes up every time data_watch.py reloads one)
+    """
+    return "-".join(map(str, data.source_versions(sources(dataset))))
+
+
+def get_figure(dataset, panel):
+    """
+    One panel's figure as it goes to the browser (animated figures leave their frames behind, see frames.py)
+    """
+    with data.pinned():
+        return frames.streaming_figure(get_full_figure(dataset, panel), dataset, panel, data_version(dataset))
+
+
+def get_figure_update(dataset, panel, shown=None):
+    """
+    One panel's figure, or just the changes from the figure the browser is showing (for dataset `shown`)
+    """
+    figure = get_figure(dataset, panel)
+    if not figure_patch.FIGURE_PATCHES or shown == dataset or shown not in FIGURE_BUILDERS:
+        return figure
+    patch = figure_patch.figure_patch(get_figure(shown, panel), figure)
+    return figure if patch is None else patch
+
+
+def build_json(dataset, panel):
+    """
+    Build and serialize one figure, returning (json text, build seconds, serialize seconds)
+    this is what runs in the figure pool, so it takes names instead of functions and hands back plain text
+    """
+    start = time.perf_counter()
+    fig = FIGURE_BUILDERS[dataset][panel]()
+    built = time.perf_counter()
+    text = serialize_figure(fig)[0]
+    return text, built - start, time.perf_counter() - built
+
+
+def build_missing(dataset, panels):
+    """
+    Build the given panels of a dataset at the same time (see figure_pool.py) and put them in the cache
+    """
+    # the version from before the build, so figures that were built while a reload landed get rebuilt next time
+    versions = data.source_versions(sources(dataset))
+    results = figure_pool.run_all(build_json, [(dataset, panel) for panel in panels])
+    for panel, (text, build_seconds, serialize_seconds) in zip(panels, results):
+        metrics.observe("dashboard_figure_build_seconds", build_seconds, dataset=dataset, figure=panel)
+        metrics.observe("dashboard_figure_serialize_seconds", serialize_seconds, dataset=dataset, figure=panel)
+        metrics.observe("dashboard_figure_bytes", len(text), dataset=dataset, figure=panel)
+        figure_cache.put((dataset, panel), parse_json(text), text, fingerprint=versions)
+
+
+def rebuild_source(path, snapshot):
+    """
+    Build every cached figure that depends on the csv file `path` from the data in `snapshot`,
+    without touching the cache yet - returns [(key, figure, json text, versions)] for install_figures()
+    """
+    rebuilt = []
+    with data.pinned(snapshot):
+        for dataset, panel in figure_cache.built_from(path):
+            try:
+                text = build_json(dataset, panel)[0]
+            except (KeyError, IndexError, ValueError):
+                # the new data doesn't have what this figure needs anymore, it just drops out of the cache
+                continue
+            rebuilt.append(((dataset, panel), parse_json(text), text, data.source_versions(sources(dataset))))
+    return rebuilt
+
+
+def install_figures(rebuilt):
+    """
+    Put the figures from rebuild_source() in the cache, once their snapshot has been installed
+    """
+    for key, figure, text, versions in rebuilt:
+        figure_cache.put(key, figure, text, fingerprint=versions)
+
+
+_bundle_locks = defaultdict(threading.Lock)
+
+
+def get_figures(dataset):
+    """
+    Every panel's figure for a dataset, in PANELS order
+    """
+    # one build per dataset at a time, so everyone who asks while it's building gets the same figures
+    with data.pinned(), _bundle_locks[dataset]:
+        missing = [panel for panel in PANELS if (dataset, panel) not in figure_cache]
+        if missing:
+            load_precomputed(dataset)
+            missing = [panel for panel in PANELS if (dataset, panel) not in figure_cache]
+        if len(missing) > 1:
+            build_missing(dataset, missing)
+        return tuple(get_figure(dataset, panel) for panel in PANELS)
+
+
+def warm_up():
+    """
+    Load the data and every dataset's figures now, instead of waiting for someone to click a button
+    """
+    # both datasets load at the same time, they're mostly waiting on files (or a database)
+    for loading in [data_sources.fetch(data.music), data_sources.fetch(data.whd)]:
+        loading.result()
+    for dataset in FIGURE_BUILDERS:
+        get_figures(dataset)
@@ -0,0 +1,48 @@
+# streaming for animated figures (the all-years world happiness map, histogram and ternary plot)
+# px puts every animation frame into the figure, so the first response grows with every year in WHD.csv
+# instead we send the figure with only its first frame drawn, and the browser fetches the other frames
+# from FRAME_ROUTE in the background (see stream_frames in assets/clientside.js), keeping only a few of them around
+# the frame urls include the version of the data the figure was built from, so after a reload (see data_watch.py)
+# the browser can't mix frames of the old data into a figure of the new one
+# set ANIMATION_STREAMING=0 to send every frame up front like before
+import os
+
+import flask
+
+from figure_cache import orjson
+
+ANIMATION_STREAMING = os.environ.get("ANIMATION_STREAMING", "1") == "1"
+FRAME_ROUTE = "/_dash-frames"
+
+
+def streaming_figure(figure, dataset, panel, version="0"):
+    """
+    The figure without its frames, plus a note in layout.meta telling the browser where to fetch them
+    version is the version of the data the figure was built from, it goes in the frame urls
+    """
+    frames = figure.get("frames")
+    if not ANIMATION_STREAMING or not frames:
+        return figure
+    layout = dict(figure.get("layout", {}))
+    layout["meta"] = {"frames": {"url": f"{FRAME_ROUTE}/{dataset}/{panel}/{version}/",
+                                 "names": [frame.get("name") for frame in frames]}}
+    # an empty list (not a missing key) so plotly.js drops the frames of whatever figure was there before
+    return dict(figure, layout=layout, frames=[])
+
+
+def register(server, get_full_figure, datasets, panels, version=lambda dataset: "0"):
+    """
+    Add the route that serves one animation frame of one figure
+    get_full_figure(dataset, panel) has to return the figure dict with all of its frames,
+    and version(dataset) the version of its data as it is now (frames of any other version are gone)
+    """
+
+    @server.route(f"{FRAME_ROUTE}/<dataset>/<panel>/<data_version>/<name>")
+    def animation_frame(dataset, panel, data_version, name):
+        if dataset not in datasets or panel not in panels or data_version != version(dataset):
+            flask.abort(404)
+        for frame in get_full_figure(dataset, panel).get("frames", []):
+            if str(frame.get("name")) == name:
+                text = orjson.dumps(frame) if orjson is not None else flask.json.dumps(frame)
+                return flask.Response(text, mimetype="application/json")
+        flask.abort(404)
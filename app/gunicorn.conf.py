@@ -0,0 +1,35 @@
+# recommended gunicorn settings for the app, every value can be overridden with an environment variable
+#     gunicorn -c gunicorn.conf.py wsgi:server
+# python -m benchmarks.load compares this setup with the development server
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8050")
+
+# one worker process per cpu core runs figure building in parallel (pandas / plotly hold the GIL)
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# a few threads per worker keep cheap requests (cached figures, assets) moving while another request builds figures
+threads = int(os.environ.get("THREADS", 4))
+worker_class = "gthread"
+
+# load the app (data + figures) once before forking so every worker shares it, see wsgi.py
+# unless STARTUP=background, then every worker starts listening right away and loads it in the background
+preload_app = os.environ.get("STARTUP", "preload") != "background"
+
+# building a big dataset's figures the first time can take a while
+timeout = int(os.environ.get("TIMEOUT", 120))
+# recycle workers now and then so memory fragmentation doesn't build up, with jitter so they don't all restart at once
+max_requests = int(os.environ.get("MAX_REQUESTS", 5000))
+max_requests_jitter = 500
+
+accesslog = os.environ.get("ACCESS_LOG", None)
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        # the background warm-up in wsgi.py starts watching once the data is loaded
+        return
+    # every worker watches the csv files itself, see data_watch.py
+    import data_watch
+
+    data_watch.start()
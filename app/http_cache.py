@@ -0,0 +1,173 @@
+# compression and caching headers for everything the server sends
+#   - JSON (callback responses, the layout, animation frames), HTML, CSS, JS, SVG and csv responses are compressed
+#     with brotli when it's installed (`pip install brotli`) and the browser accepts it, gzip otherwise.
+#     the same figures go out over and over, so compressed bodies are kept in a small LRU keyed by their hash,
+#     and sending a dataset's figures again only costs a hash instead of compressing them again
+#   - GET responses (the page, its layout and callback graph, animation frames, assets) get an ETag,
+#     so a repeat visit gets "304 Not Modified" instead of the whole layout with its initial figures again
+#   - files in assets/ are linked with a hash of their contents (instead of Dash's modified time), and those
+#     links are cached by the browser for a year - a changed file gets a new hash, so there's nothing stale
+# callback responses are POSTs, which browsers never cache, so for those it's only the compression that helps
+# settings (environment variables):
+#   HTTP_COMPRESSION   - "1" (default) to compress responses, "0" to leave that to a proxy in front of the app
+#   COMPRESS_MIN_BYTES - responses smaller than this aren't worth compressing (default 500)
+#   ASSET_MAX_AGE      - seconds the browser keeps hashed assets (default one year)
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import flask
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HTTP_COMPRESSION = os.environ.get("HTTP_COMPRESSION", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 500))
+ASSET_MAX_AGE = int(os.environ.get("ASSET_MAX_AGE", 365 * 24 * 3600))
+# bodies at least this big (figures, mostly) have their compressed versions kept for next time
+COMPRESS_CACHE_MIN_BYTES = 16 * 1024
+COMPRESS_CACHE_SIZE = 64
+
+COMPRESSIBLE = ("application/json", "application/javascript", "text/", "image/svg+xml")
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class CompressedCache:
+    """
+    LRU of compressed bodies, keyed by (hash of the body, encoding)
+    """
+
+    def __init__(self, max_size=COMPRESS_CACHE_SIZE):
+        self.max_size = max_size
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, body, digest, encoding):
+        key = (digest, encoding)
+        with self._lock:
+            if key in self._bodies:
+                self._bodies.move_to_end(key)
+                return self._bodies[key]
+        compressed = compress(body, encoding)
+        with self._lock:
+            self._bodies[key] = compressed
+            while len(self._bodies) > self.max_size:
+                self._bodies.popitem(last=False)
+        return compressed
+
+
+compressed_bodies = CompressedCache()
+
+_hashes = {}  # file path -> ((size, modified time), content hash)
+
+
+def file_hash(path):
+    """
+    Short hash of a file's contents, only read again when the file changes
+    """
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    known = _hashes.get(path)
+    if known is None or known[0] != version:
+        with open(path, "rb") as f:
+            known = (version, hashlib.sha256(f.read()).hexdigest()[:16])
+        _hashes[path] = known
+    return known[1]
+
+
+def asset_url(app, path):
+    """
+    Link to a file in assets/ with its content hash on the end, for html.Img(src=...) and the like
+    """
+    return f"{app.get_asset_url(path)}?m={file_hash(os.path.join(app.config.assets_folder, path))}"
+
+
+def accepted_encoding():
+    accepted = flask.request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def install(app):
+    """
+    Add compression, ETags and content-hashed asset links to a Dash app
+    """
+    server = app.server
+    assets_prefix = app.get_asset_url("")
+    collect_resources = app._collect_and_register_resources
+
+    def collect_hashed_resources(*args, **kwargs):
+        # Dash links its css/js assets as ...?m=<modified time>, make that the content hash instead
+        return [asset_url(app, src[len(assets_prefix):].split("?")[0])
+                if isinstance(src, str) and src.startswith(assets_prefix) else src
+                for src in collect_resources(*args, **kwargs)]
+
+    app._collect_and_register_resources = collect_hashed_resources
+
+    def cache_asset(response):
+        path = os.path.join(app.config.assets_folder, flask.request.path[len(assets_prefix):])
+        try:
+            hashed = flask.request.args.get("m") == file_hash(path)
+        except OSError:
+            hashed = False
+        if hashed:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = ASSET_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            # asked for without (or with an old) hash, so check back every time
+            response.cache_control.no_cache = True
+
+    @server.after_request
+    def compress_and_cache(response):
+        if response.status_code != 200 or "Content-Encoding" in response.headers:
+            return response
+        if flask.request.path.startswith(assets_prefix):
+            cache_asset(response)
+        compressible = response.mimetype and response.mimetype.startswith(COMPRESSIBLE)
+        is_get = flask.request.method in ("GET", "HEAD")
+        if not (compressible or is_get):
+            return response
+        # static files come back as a file stream, read it so it can be hashed and compressed
+        response.direct_passthrough = False
+        body = response.get_data()
+        digest = hashlib.sha1(body).hexdigest()
+
+        encoding = None
+        if HTTP_COMPRESSION and compressible and len(body) >= COMPRESS_MIN_BYTES:
+            encoding = accepted_encoding()
+            response.vary.add("Accept-Encoding")
+
+        if is_get:
+            # the compressed and plain versions are different bytes, so they get different tags
+            etag = f"{digest}-{encoding}" if encoding else digest
+            response.set_etag(etag)
+            if "Cache-Control" not in response.headers:
+                # Dash's own fingerprinted scripts already say how long to keep them, everything else checks back
+                response.cache_control.no_cache = True
+            if etag in flask.request.if_none_match:
+                response.status_code = 304
+                response.set_data(b"")
+                return response
+
+        if encoding:
+            if len(body) >= COMPRESS_CACHE_MIN_BYTES:
+                compressed = compressed_bodies.get(body, digest, encoding)
+            else:
+                compressed = compress(body, encoding)
+            response.set_data(compressed)
+            response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,162 @@
+# timing and size metrics for the app, served in Prometheus text format at /metrics
+# what gets recorded:
+#   dashboard_callback_seconds          - every Dash callback request, labelled by its outputs
+#   dashboard_figure_build_seconds      - building one figure (cache misses only)
+#   dashboard_figure_serialize_seconds  - turning one figure into JSON
+#   dashboard_figure_bytes              - how big that JSON is
+# each gunicorn worker keeps its own numbers, so every sample carries a pid label
+#
+# callbacks slower than SLOW_CALLBACK_SECONDS get logged as warnings
+# with PROFILING=1, any request sent with an "X-Profile: 1" header (or ?profile=1) is run under cProfile
+# and the profile is saved to build/profiles/ (use "X-Profile: pyinstrument" if pyinstrument is installed)
+import cProfile
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import flask
+
+SLOW_CALLBACK_SECONDS = float(os.environ.get("SLOW_CALLBACK_SECONDS", 1.0))
+PROFILING = os.environ.get("PROFILING", "0") == "1"
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build", "profiles")
+
+logger = logging.getLogger("dashboard")
+
+# name -> (prometheus type, help text)
+METRICS = {
+    "dashboard_callback_seconds": ("summary", "Time spent handling a Dash callback request"),
+    "dashboard_figure_build_seconds": ("summary", "Time spent building one figure"),
+    "dashboard_figure_serialize_seconds": ("summary", "Time spent serializing one figure to JSON"),
+    "dashboard_figure_bytes": ("summary", "Size of one serialized figure in bytes"),
+}
+
+
+class Metrics:
+    """
+    Thread-safe count/sum summaries, keyed by metric name and labels
+    """
+
+    def __init__(self):
+        self._summaries = defaultdict(lambda: [0, 0.0])  # (name, labels) -> [count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries[key]
+            summary[0] += 1
+            summary[1] += value
+
+    def render(self):
+        """
+        Everything recorded so far, in the Prometheus text exposition format
+        """
+        with self._lock:
+            summaries = sorted((key, list(value)) for key, value in self._summaries.items())
+        pid = str(os.getpid())
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), (count, total) in summaries:
+                if metric != name:
+                    continue
+                label_text = ",".join(f'{key}="{escape(value)}"' for key, value in labels + (("pid", pid),))
+                lines.append(f"{name}_count{{{label_text}}} {count}")
+                lines.append(f"{name}_sum{{{label_text}}} {total:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+observe = metrics.observe
+
+
+@contextmanager
+def timed(name, **labels):
+    """
+    Time the body of a with block and record it under name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def start_profile():
+    """
+    Start profiling this request if it asked for it (and profiling is allowed at all)
+    """
+    if not PROFILING:
+        return None
+    mode = flask.request.headers.get("X-Profile") or flask.request.args.get("profile")
+    if not mode or mode == "0":
+        return None
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument isn't installed, falling back to cProfile")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def save_profile(profiler, name):
+    """
+    Stop a request's profiler and write its results to PROFILE_DIR, returning the file name
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}-{name}"
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = os.path.join(PROFILE_DIR, stem + ".prof")
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = os.path.join(PROFILE_DIR, stem + ".html")
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    return os.path.basename(path)
+
+
+def instrument(server):
+    """
+    Hook the metrics, slow callback logging and per-request profiling into a Flask server
+    """
+
+    @server.before_request
+    def before():
+        flask.g.metrics_start = time.perf_counter()
+        flask.g.profiler = start_profile()
+
+    @server.after_request
+    def after(response):
+        elapsed = time.perf_counter() - flask.g.get("metrics_start", time.perf_counter())
+        name = flask.request.path.strip("/").replace("/", "_") or "index"
+        if flask.request.path.endswith("/_dash-update-component"):
+            body = flask.request.get_json(silent=True) or {}
+            name = body.get("output", "unknown")
+            observe("dashboard_callback_seconds", elapsed, callback=name)
+            if elapsed > SLOW_CALLBACK_SECONDS:
+                logger.warning("slow callback %s took %.2fs (%d bytes)", name, elapsed, response.calculate_content_length() or 0)
+        profiler = flask.g.get("profiler")
+        if profiler is not None:
+            safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)[:60]
+            response.headers["X-Profile-File"] = save_profile(profiler, safe_name)
+        return response
+
+    @server.route("/metrics")
+    def prometheus_metrics():
+        return flask.Response(metrics.render(), mimetype="text/plain; version=0.0.4")
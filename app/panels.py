@@ -0,0 +1,55 @@
+# the panel registry: every graph on the page is declared once, as a Panel with its id, title, help text,
+# where it goes on the page and the functions that build its figure for each dataset
+# (the declarations are at the bottom of figures.py, next to the figure functions)
+# appv1.py makes the panel grid, the help modals and every callback from the registry,
+# so adding a panel is one more Panel(...) and its figure functions, nothing else
+# Please be *very* careful with changing a panel's id, it's the first part of all its component IDs
+from textwrap import dedent
+
+# every registered panel, in the order they're laid out and the dataset callbacks return them
+REGISTRY = []
+
+
+class Panel:
+    """
+    One graph on the page
+    """
+
+    def __init__(self, id, title, info, row, figures, modal_side="bottom", modebar=False, height=None):
+        self.id = id
+        self.title = title
+        # the help text in the panel's info modal, written in Markdown
+        self.info = dedent(info)
+        # panels with the same row number sit next to each other, a panel on its own gets the whole width
+        self.row = row
+        # dataset -> function that builds the figure, "whd_year" is called with a year for every single-year dataset
+        self.figures = figures
+        # whether the info modal opens above ("top") or below ("bottom") the panel
+        self.modal_side = modal_side
+        self.modebar = modebar
+        # a fixed height in pixels shows a loading spinner while the figure is on its way
+        self.height = height
+
+
+def register(panel):
+    """
+    Add a panel to the page (after the ones already registered)
+    """
+    if any(known.id == panel.id for known in REGISTRY):
+        raise ValueError(f"there's already a panel called {panel.id}")
+    REGISTRY.append(panel)
+    return panel
+
+
+def ids():
+    return [panel.id for panel in REGISTRY]
+
+
+def rows():
+    """
+    The registered panels grouped into rows, top to bottom
+    """
+    grouped = {}
+    for panel in REGISTRY:
+        grouped.setdefault(panel.row, []).append(panel)
+    return [grouped[row] for row in sorted(grouped)]
@@ -0,0 +1,130 @@
+# this builds every dataset's figures ahead of time and saves them to one compressed file
+# run it from the app folder whenever the data or the figure code changes:
+#     python precompute.py
+# when the app starts it looks for that file first, and only falls back to
+# reading the csv files and building the figures if it's missing or out of date
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+
+import plotly
+
+import figure_cache
+
+# bump this whenever the figure code changes in a way that should throw away old artifacts
+ARTIFACT_VERSION = 2
+
+BUILD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "build")
+DEFAULT_ARTIFACT = os.path.join(BUILD_DIR, f"figures-v{ARTIFACT_VERSION}.json.gz")
+# set FIGURE_ARTIFACT=off to always build figures from the csv files
+ARTIFACT_PATH = os.environ.get("FIGURE_ARTIFACT", DEFAULT_ARTIFACT)
+
+logger = logging.getLogger("dashboard")
+
+
+def file_hash(path):
+    """
+    sha256 of a source file, so we can tell if the artifact was built from the same data
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_header(sources):
+    """
+    Everything that has to match for a saved artifact to still be usable
+    """
+    import aggregate
+    import data
+    import frames
+
+    paths = sorted({path for paths in sources.values() for path in paths})
+    return {
+        "version": ARTIFACT_VERSION,
+        "plotly": plotly.__version__,
+        "typed_arrays": figure_cache.FIGURE_TYPED_ARRAYS,
+        # the settings that change what the figures look like, or how they're written out
+        "settings": {
+            "AGGREGATE_ROWS": aggregate.AGGREGATE_ROWS,
+            "LARGE_DATA_ROWS": aggregate.LARGE_DATA_ROWS,
+            "DATA_COMPACT": data.DATA_COMPACT,
+            "ANIMATION_STREAMING": frames.ANIMATION_STREAMING,
+            "FIGURE_JSON": figure_cache.FIGURE_JSON,
+        },
+        "sources": {os.path.basename(path): file_hash(path) for path in paths},
+    }
+
+
+def write_artifact(bundles, sources, path=DEFAULT_ARTIFACT):
+    """
+    Save {dataset: [figure json text, ...]} to a gzip file along with its header
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # the figures are already json text, so stitch them together instead of encoding them twice
+    parts = ['{"header": ', json.dumps(artifact_header(sources)), ', "bundles": {']
+    parts.append(", ".join(f"{json.dumps(key)}: [{', '.join(texts)}]" for key, texts in bundles.items()))
+    parts.append("}}")
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write("".join(parts))
+    # swap the new file in all at once so a running app never reads half an artifact
+    os.replace(tmp, path)
+    return path
+
+
+@lru_cache(maxsize=None)
+def load_artifact(path=ARTIFACT_PATH):
+    """
+    Read the artifact once and return its bundles, or None if it's missing or out of date
+    """
+    if path == "off" or not os.path.exists(path):
+        return None
+    import data
+
+    with gzip.open(path, "rb") as f:
+        artifact = figure_cache.parse_json(f.read())
+    if artifact.get("header") != artifact_header(data.SOURCES):
+        logger.warning("ignoring out of date figure artifact %s, run precompute.py to rebuild it", path)
+        return None
+    return artifact["bundles"]
+
+
+def load_bundle(dataset):
+    """
+    The precomputed figure dicts for one dataset, or None if there aren't any
+    """
+    bundles = load_artifact()
+    if bundles is None:
+        return None
+    return bundles.get(dataset)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute every dataset's figures into one artifact file")
+    parser.add_argument("--output", default=DEFAULT_ARTIFACT, help="where to write the artifact")
+    args = parser.parse_args(argv)
+
+    import data
+    import figure_pool
+    from figures import FIGURE_BUILDERS, PANELS, build_json
+
+    # hand every figure of every dataset to the figure pool at once
+    start = time.perf_counter()
+    jobs = [(dataset, panel) for dataset in FIGURE_BUILDERS for panel in PANELS]
+    texts = iter(text for text, _, _ in figure_pool.run_all(build_json, jobs))
+    bundles = {dataset: [next(texts) for _ in PANELS] for dataset in FIGURE_BUILDERS}
+    print(f"built {len(jobs)} figures in {time.perf_counter() - start:.2f}s")
+    path = write_artifact(bundles, data.SOURCES, args.output)
+    print(f"wrote {path} ({os.path.getsize(path) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# remembers what everyone is looking at (the dataset, and the music survey filters) on the server
+# the page's url always says what's on screen, like ?dataset=mxmh&genre=Rock&age=18-30, so reloading the page,
+# sharing the link or opening it in another tab comes back to the same figures
+# every browser also gets a session cookie, and the store keeps that session's last view,
+# so opening the app without anything in the url picks up where you left off
+# the figures themselves come out of the figure caches everyone shares (figures.py and crossfilter.py),
+# so any number of people looking at the same view only cost one build
+# settings (environment variables):
+#   SESSION_STORE      - "memory" (default) keeps sessions in an LRU in each process, or a redis url like
+#                        redis://localhost:6379/0 (needs pip install redis) so every gunicorn worker shares them
+#                        and they survive restarts (anything that speaks the redis protocol works)
+#   SESSION_STORE_SIZE - how many sessions the memory store keeps (default 10000)
+#   SESSION_TTL        - seconds the redis store keeps a session after it was last used (default 30 days)
+import json
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlencode
+
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+SESSION_STORE_SIZE = int(os.environ.get("SESSION_STORE_SIZE", 10000))
+SESSION_TTL = int(os.environ.get("SESSION_TTL", 30 * 24 * 3600))
+SESSION_COOKIE = "dashboard_session"
+
+# the url parameter for each music survey filter
+FILTER_PARAMS = {"genre": "Fav genre", "effects": "Music effects", "service": "Primary streaming service"}
+
+
+class MemoryStore:
+    """
+    Size-bounded LRU of strings, only seen by the process it's in
+    """
+
+    def __init__(self, max_size=SESSION_STORE_SIZE):
+        self.max_size = max_size
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._values:
+                return None
+            self._values.move_to_end(key)
+            return self._values[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+
+class RedisStore:
+    """
+    Strings kept in redis (or anything with the same get/setex/expire), shared by every process that connects to it
+    each one expires ttl seconds after it was last read or written
+    """
+
+    def __init__(self, client, ttl=SESSION_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.client.get(key)
+        if value is None:
+            return None
+        self.client.expire(key, self.ttl)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key, value):
+        self.client.setex(key, self.ttl, value)
+
+
+def open_store(spec=SESSION_STORE):
+    """
+    The store for a SESSION_STORE setting
+    """
+    if spec == "memory":
+        return MemoryStore()
+    try:
+        import redis
+    except ImportError:
+        raise ImportError(f"SESSION_STORE={spec} needs redis, install it with pip install redis") from None
+    return RedisStore(redis.Redis.from_url(spec))
+
+
+store = open_store()
+
+
+def view_from_query(search, datasets):
+    """
+    The view a url's query string asks for, as {"dataset": ..., "filters": {...}} (None if it doesn't name a dataset)
+    datasets is every dataset id there is, anything else in the url is ignored
+    """
+    params = parse_qs((search or "").lstrip("?"))
+    dataset = params.get("dataset", [None])[0]
+    if dataset not in datasets:
+        return None
+    filters = {}
+    if dataset == "mxmh":
+        for param, column in FILTER_PARAMS.items():
+            if params.get(param):
+                filters[column] = params[param]
+        try:
+            low, high = params["age"][0].split("-")
+            filters["Age"] = [int(low), int(high)]
+        except (KeyError, ValueError):
+            pass
+    return {"dataset": dataset, "filters": filters}
+
+
+def view_query(view):
+    """
+    The query string for a view, the other way around from view_from_query()
+    """
+    params = [("dataset", view["dataset"])]
+    for param, column in FILTER_PARAMS.items():
+        params += [(param, value) for value in view["filters"].get(column, [])]
+    if "Age" in view["filters"]:
+        params.append(("age", "-".join(map(str, view["filters"]["Age"]))))
+    return "?" + urlencode(params)
+
+
+def new_session():
+    return secrets.token_urlsafe(16)
+
+
+def last_view(session):
+    """
+    The view a session was looking at last, or None for a session we don't know (or have forgotten)
+    """
+    text = store.get(f"session:{session}") if session else None
+    return json.loads(text) if text else None
+
+
+def remember(session, view):
+    store.set(f"session:{session}", json.dumps(view, sort_keys=True))
@@ -0,0 +1,108 @@
+# how a server process gets going, and the /ready endpoint that says when it's done
+# by default (STARTUP=preload) gunicorn imports the app and builds every dataset's figures before it starts
+# listening, then forks its workers, so nobody ever waits on a figure - but a new server takes a while to come up
+# with STARTUP=background every worker starts listening straight away and does the slow part on a thread:
+#   1. importing the app (Dash, pandas, plotly - most of the startup time is just these imports)
+#   2. warming up: loading the data and building every dataset's figures
+# requests that arrive during 1. wait for it, requests during 2. are answered (building what they need themselves)
+# /ready answers 503 until both are done and 200 after, point health checks / load balancers at it
+# if either one fails, the error is logged and /ready keeps answering 503 with the error in its body
+# this file only imports the standard library, so it's quick to load before anything else
+# settings (environment variables):
+#   STARTUP      - "preload" (default) or "background"
+#   LOAD_TIMEOUT - seconds a request waits for the app to be imported before giving up with a 503 (default 60)
+import json
+import logging
+import os
+import threading
+import time
+
+STARTUP = os.environ.get("STARTUP", "preload")
+LOAD_TIMEOUT = float(os.environ.get("LOAD_TIMEOUT", 60))
+READY_PATH = "/ready"
+
+logger = logging.getLogger("dashboard")
+
+# set once every dataset's figures are built (or right away when there's nothing to warm up)
+ready = threading.Event()
+# what went wrong, if loading or warming up failed
+failure = None
+_started = time.perf_counter()
+
+
+def status():
+    body = {"ready": ready.is_set(), "startup": STARTUP, "uptime_seconds": round(time.perf_counter() - _started, 3)}
+    if failure is not None:
+        body["error"] = failure
+    return body
+
+
+def failed(message):
+    """
+    Remember that starting up went wrong, for /ready to report
+    """
+    global failure
+    failure = message
+
+
+def respond(start_response, code, body, headers=()):
+    text = json.dumps(body).encode()
+    reason = {200: "OK", 500: "Internal Server Error", 503: "Service Unavailable"}[code]
+    start_response(f"{code} {reason}", [("Content-Type", "application/json"), ("Cache-Control", "no-store"),
+                                        ("Content-Length", str(len(text))), *headers])
+    return [text]
+
+
+def register(server):
+    """
+    Add the /ready endpoint to a Flask server
+    """
+    @server.route(READY_PATH)
+    def ready_status():
+        body = status()
+        return body, 200 if body["ready"] else 503, {"Cache-Control": "no-store"}
+
+
+class BackgroundApp:
+    """
+    A WSGI app that starts answering right away while load() imports the real one on a background thread
+    load() returns the real WSGI app, then warm_up() (if it's passed) runs before the worker counts as ready
+    """
+
+    def __init__(self, load, warm_up=None):
+        self.app = None
+        self.error = None
+        self.loaded = threading.Event()
+        threading.Thread(target=self._start, args=(load, warm_up), name="warm-up", daemon=True).start()
+
+    def _start(self, load, warm_up):
+        try:
+            self.app = load()
+        except Exception as error:
+            logger.exception("couldn't load the app")
+            self.error = error
+            failed(f"the app failed to load: {error}")
+            return
+        finally:
+            self.loaded.set()
+        logger.info("app loaded in %.2fs, warming up", time.perf_counter() - _started)
+        if warm_up is not None:
+            try:
+                warm_up()
+            except Exception as error:
+                # requests still get answered (building what they need themselves), but the worker isn't ready
+                logger.exception("couldn't warm up")
+                failed(f"warming up failed: {error}")
+                return
+        ready.set()
+        logger.info("warmed up in %.2fs", time.perf_counter() - _started)
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO") == READY_PATH:
+            body = status()
+            return respond(start_response, 200 if body["ready"] else 503, body)
+        if not self.loaded.wait(LOAD_TIMEOUT):
+            return respond(start_response, 503, {"error": "still starting up"}, [("Retry-After", "5")])
+        if self.error is not None:
+            return respond(start_response, 500, {"error": f"the app failed to load: {self.error}"})
+        return self.app(environ, start_response)
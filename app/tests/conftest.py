@@ -0,0 +1,5 @@
+# the tests import the app's modules the same way the app does, from the app folder
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import aggregate
+
+COUNTRIES = pd.DataFrame({
+    "Region": ["Europe", "Europe", "Europe", "Asia", "Asia", "Asia"],
+    "Country": ["France", "Spain", "France", "Japan", "Nepal", "Japan"],
+    "Ratio": [1.0, 2.0, 3.0, 4.0, 0.5, 1.5],
+    "Score": [6.0, 7.0, 6.5, 5.9, 4.8, 6.1],
+    "Continent": ["EU", "EU", "EU", "AS", "AS", "AS?"],
+})
+
+
+def boxes_by_id(ids, parents, values, colors, hover):
+    return {id_: (parent, value, color, tuple(extra))
+            for id_, parent, value, color, extra in zip(ids, parents, values, colors, hover)}
+
+
+def test_hierarchy_table_matches_px_treemap():
+    trace = px.treemap(COUNTRIES, path=[px.Constant("world"), "Region", "Country"], values="Ratio", color="Score",
+                       hover_data=["Continent"]).data[0]
+    expected = boxes_by_id(trace.ids, trace.parents, trace.values, trace.marker.colors,
+                           [row[:1] for row in trace.customdata])
+    boxes = aggregate.hierarchy_table(COUNTRIES, ["Region", "Country"], "Ratio", color="Score", hover=["Continent"],
+                                      root="world")
+    got = boxes_by_id(boxes["id"], boxes["parent"], boxes["value"], boxes["color"], boxes[["Continent"]].to_numpy())
+    assert got.keys() == expected.keys()
+    for id_, (parent, value, color, hover) in expected.items():
+        assert got[id_][0] == parent
+        assert np.isclose(got[id_][1], value) and np.isclose(got[id_][2], color), id_
+        assert got[id_][3] == hover, id_
+
+
+def test_hierarchy_table_without_root_or_color():
+    boxes = aggregate.hierarchy_table(COUNTRIES, ["Region", "Country"], "Ratio")
+    assert list(boxes.columns) == ["id", "parent", "label", "value"]
+    top = boxes[boxes["parent"] == ""].set_index("id")["value"].to_dict()
+    assert top == {"Europe": 6.0, "Asia": 6.0}
+    assert boxes.set_index("id").loc["Europe/France", "value"] == 4.0
@@ -0,0 +1,49 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from bitmap_index import BitmapIndex
+
+GENRES = ["Rock", "Pop", "Jazz", "Metal", None]
+EFFECTS = ["Improve", "No effect", "Worsen"]
+
+
+def survey(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    ages = rng.integers(10, 80, rows).astype(float)
+    ages[rng.random(rows) < 0.05] = np.nan  # a few people didn't say
+    return pd.DataFrame({"Fav genre": rng.choice(GENRES, rows), "Music effects": rng.choice(EFFECTS, rows),
+                         "Age": ages})
+
+
+def mask(df, filters):
+    # the same filters answered the slow way, with pandas
+    keep = np.ones(len(df), dtype=bool)
+    for column, wanted in filters:
+        if column == "Age":
+            keep &= df[column].between(*wanted).to_numpy()
+        else:
+            keep &= df[column].isin(wanted).to_numpy()
+    return np.flatnonzero(keep)
+
+
+def test_filters_pick_the_same_rows_as_pandas():
+    df = survey()
+    index = BitmapIndex(df, categorical=["Fav genre", "Music effects"], ranges=["Age"])
+    genres = [(), ("Rock",), ("Rock", "Pop"), ("Blues",), ("Jazz", "Blues")]
+    effects = [(), ("Improve",), ("Improve", "Worsen")]
+    # ranges inside, around and outside the ages there are, including ones that fall between two ages
+    ages = [None, (18, 30), (0, 200), (30.5, 40.5), (90, 99), (40, 40), (50, 20)]
+    for genre, effect, age in itertools.product(genres, effects, ages):
+        filters = tuple((column, values) for column, values in (("Fav genre", genre), ("Music effects", effect))
+                        if values)
+        if age is not None:
+            filters += (("Age", age),)
+        assert np.array_equal(index.select(filters), mask(df, filters)), filters
+
+
+def test_no_filters_is_every_row():
+    df = survey(rows=13)  # not a whole number of bytes
+    index = BitmapIndex(df, categorical=["Fav genre"], ranges=["Age"])
+    assert np.array_equal(index.select(()), np.arange(13))
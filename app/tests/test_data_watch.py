@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+import data_sources
+from data_watch import SourceWatcher
+
+HEADER = b"Age,Fav genre\n"
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "survey.csv"
+    path.write_bytes(HEADER + b"18,Rock\n25,Pop\n")
+    return path
+
+
+def watcher_for(path):
+    source = data_sources.CsvSource(str(path))
+    watcher = SourceWatcher("survey", {"source": source, "loader": None, "clean": None, "categorical": []})
+    # what the watcher keeps after its first reload, and a note of every csv it parses from then on
+    watcher.raw = source.read()
+    parsed = []
+    read = source.read
+    source.read = lambda file=None: parsed.append(file.getvalue()) or read(file)
+    return watcher, parsed
+
+
+@pytest.mark.parametrize("appended", [b"31,Jazz\n40,Metal\n", b"31,Jazz\n40,Metal"])
+def test_appended_rows_are_parsed_on_their_own(csv, appended):
+    watcher, parsed = watcher_for(csv)
+    contents = csv.read_bytes() + appended
+    rows = watcher.parse(contents)
+    assert parsed == [HEADER + appended]
+    csv.write_bytes(contents)
+    pd.testing.assert_frame_equal(rows, pd.read_csv(csv))
+
+
+def test_file_without_a_trailing_newline_is_read_again(csv):
+    csv.write_bytes(HEADER + b"18,Rock\n25,Pop")
+    watcher, parsed = watcher_for(csv)
+    assert not watcher.ends_with_newline
+    # the first new "row" finishes the last one, only a full read gets that right
+    contents = csv.read_bytes() + b"\n31,Jazz\n"
+    rows = watcher.parse(contents)
+    assert parsed == [contents]
+    csv.write_bytes(contents)
+    pd.testing.assert_frame_equal(rows, pd.read_csv(csv))
+
+
+def test_edited_file_is_read_again(csv):
+    watcher, parsed = watcher_for(csv)
+    contents = HEADER + b"19,Rock\n25,Pop\n31,Jazz\n"
+    rows = watcher.parse(contents)
+    assert parsed == [contents]
+    assert rows["Age"].tolist() == [19, 25, 31]
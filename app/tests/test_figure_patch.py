@@ -0,0 +1,54 @@
+import copy
+
+from dash import Patch
+
+from figure_patch import DELETE, figure_patch
+
+
+def apply(patch, figure):
+    """
+    Apply a Patch to a figure dict the way dash-renderer does
+    """
+    figure = copy.deepcopy(figure)
+    for operation in patch.to_plotly_json()["operations"]:
+        *path, last = operation["location"]
+        target = figure
+        for key in path:
+            target = target[key]
+        if operation["operation"] == "Assign":
+            target[last] = operation["params"]["value"]
+        elif operation["operation"] == "Delete":
+            del target[last]
+        else:
+            raise AssertionError(f"unexpected patch operation {operation['operation']}")
+    return figure
+
+
+OLD = {"data": [{"type": "bar", "x": ["a", "b"], "y": [1, 2], "name": "2015"},
+                {"type": "scatter", "x": [1, 2], "y": [3, 4], "marker": {"color": "red", "size": 4}}],
+       "layout": {"title": {"text": "2015"}, "annotations": [{"text": "old"}], "xaxis": {"range": [0, 1]}}}
+NEW = {"data": [{"type": "bar", "x": ["a", "b", "c"], "y": [1, 2, 3], "name": "2019"},
+                {"type": "scatter", "x": [1, 2], "y": [3, 5], "marker": {"color": "red"}}],
+       "layout": {"title": {"text": "2019"}, "annotations": [{"text": "new"}], "yaxis": {"type": "log"}}}
+
+
+def test_patched_figure_equals_the_new_one():
+    patch = figure_patch(OLD, NEW)
+    assert isinstance(patch, Patch)
+    assert apply(patch, OLD) == NEW
+    # and back again
+    assert apply(figure_patch(NEW, OLD), NEW) == OLD
+
+
+def test_only_what_changed_is_sent():
+    operations = figure_patch(OLD, NEW).to_plotly_json()["operations"]
+    locations = {tuple(operation["location"]) for operation in operations}
+    assert ("data", 1, "marker", "size") in locations
+    assert not any(location[:3] == ("data", 1, "marker") and location[-1] == "color" for location in locations)
+    assert figure_patch(OLD, copy.deepcopy(OLD)).to_plotly_json()["operations"] == []
+    assert DELETE not in [operation["params"].get("value") for operation in operations]
+
+
+def test_different_traces_are_not_patched():
+    assert figure_patch(OLD, {"data": NEW["data"][:1], "layout": NEW["layout"]}) is None
+    assert figure_patch(OLD, {"data": [dict(NEW["data"][0], type="pie"), NEW["data"][1]], "layout": {}}) is None
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import data
+import figure_pool
+
+
+def snapshot_name():
+    return data.current_snapshot().get("name")
+
+
+def test_threads_read_the_callers_snapshot(monkeypatch):
+    monkeypatch.setattr(figure_pool, "FIGURE_POOL", "thread")
+    monkeypatch.setattr(figure_pool, "FIGURE_WORKERS", 2)
+    monkeypatch.setattr(figure_pool, "_disabled", False)
+    monkeypatch.setattr(figure_pool, "_pool", None)
+    try:
+        with data.pinned({"name": "pinned", "frames": {}, "versions": {}}):
+            assert figure_pool.run_all(snapshot_name, [(), (), ()]) == ["pinned"] * 3
+        assert isinstance(figure_pool.get_pool(), figure_pool.ThreadPoolExecutor)
+    finally:
+        figure_pool.shutdown()
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    monkeypatch.setattr(figure_pool, "FIGURE_POOL", "process")
+    monkeypatch.setattr(figure_pool, "FIGURE_WORKERS", 2)
+    monkeypatch.setattr(figure_pool, "_disabled", False)
+    monkeypatch.setattr(figure_pool, "_pool", None)
+    yield
+    figure_pool.shutdown(forkserver=True)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_process_builds_in_a_pool_of_its_own(process_pool):
+    import figures
+
+    # what gunicorn's preload does: build in the pool, then fork the workers
+    assert len(figure_pool.run_all(figures.build_json, [("whd15", "histo"), ("whd15", "pie")])) == 2
+    assert isinstance(figure_pool.get_pool(), figure_pool.ProcessPoolExecutor)
+    pid = os.fork()
+    if pid == 0:
+        # the child answers through its exit code, 0 if it built its figures in a pool it started itself
+        code = 1
+        try:
+            results = figure_pool.run_all(figures.build_json, [("whd16", "histo"), ("whd16", "pie")])
+            if len(results) == 2 and not figure_pool._disabled and figure_pool.get_pool() is not None:
+                code = 0
+        finally:
+            figure_pool.shutdown(forkserver=True)
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+class BrokenPool:
+    def submit(self, *args):
+        raise ChildProcessError(10, "No child processes")
+
+
+def test_broken_pool_falls_back_to_serial(monkeypatch):
+    monkeypatch.setattr(figure_pool, "_disabled", False)
+    monkeypatch.setattr(figure_pool, "get_pool", BrokenPool)
+    assert figure_pool.run_all(pow, [(2, 3), (2, 4)]) == [8, 16]
+    assert figure_pool._disabled
@@ -0,0 +1,29 @@
+import flask
+
+import frames
+
+FIGURE = {"data": [{"x": [1]}], "layout": {"title": "map"},
+          "frames": [{"name": 2015, "data": [{"x": [1]}]}, {"name": 2016, "data": [{"x": [2]}]}]}
+
+
+def test_streaming_figure_leaves_its_frames_behind(monkeypatch):
+    monkeypatch.setattr(frames, "ANIMATION_STREAMING", True)
+    figure = frames.streaming_figure(FIGURE, "whd", "main", "3")
+    assert figure["frames"] == []
+    assert figure["layout"]["meta"]["frames"] == {"url": f"{frames.FRAME_ROUTE}/whd/main/3/", "names": [2015, 2016]}
+    assert figure["layout"]["title"] == "map"
+    # figures without frames go out as they are
+    assert frames.streaming_figure({"data": []}, "mxmh", "main", "0") == {"data": []}
+
+
+def test_frames_of_other_data_versions_are_gone():
+    server = flask.Flask(__name__)
+    versions = {"whd": "1"}
+    frames.register(server, lambda dataset, panel: FIGURE, ["whd"], ["main"], versions.get)
+    client = server.test_client()
+    assert client.get(f"{frames.FRAME_ROUTE}/whd/main/1/2016").get_json() == FIGURE["frames"][1]
+    assert client.get(f"{frames.FRAME_ROUTE}/whd/main/1/2020").status_code == 404
+    assert client.get(f"{frames.FRAME_ROUTE}/mxmh/main/1/2016").status_code == 404
+    # after a reload the urls of the old version stop working
+    versions["whd"] = "2"
+    assert client.get(f"{frames.FRAME_ROUTE}/whd/main/1/2016").status_code == 404
@@ -0,0 +1,62 @@
+import gzip
+
+import dash
+import flask
+import pytest
+from dash import html
+
+import http_cache
+
+BODY = {"figure": "x" * 2000}
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "style.css").write_text("body { color: red; }")
+    app = dash.Dash(__name__, assets_folder=str(tmp_path))
+    app.layout = html.Div()
+    app.server.add_url_rule("/figure", "figure", lambda: flask.jsonify(BODY), methods=["GET", "POST"])
+    http_cache.install(app)
+    return app.server.test_client()
+
+
+def test_repeat_get_is_not_modified(client):
+    first = client.get("/figure")
+    assert first.status_code == 200 and first.get_json() == BODY
+    etag = first.headers["ETag"]
+    again = client.get("/figure", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+    # a tag from some other body gets the whole thing
+    assert client.get("/figure", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_compressed_bodies_have_their_own_tag(client, monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", None)
+    plain = client.get("/figure")
+    zipped = client.get("/figure", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.data) == plain.data
+    assert zipped.headers["ETag"] != plain.headers["ETag"]
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+    not_modified = client.get("/figure", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["ETag"]})
+    assert not_modified.status_code == 304
+    # the plain tag doesn't match the gzipped body
+    assert client.get("/figure", headers={"Accept-Encoding": "gzip",
+                                           "If-None-Match": plain.headers["ETag"]}).status_code == 200
+
+
+def test_posts_are_compressed_but_not_tagged(client):
+    # callback responses are POSTs, a browser never sends those with If-None-Match
+    response = client.post("/figure", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "ETag" not in response.headers
+
+
+def test_hashed_assets_are_kept_for_a_year(client, tmp_path):
+    url = f"/assets/style.css?m={http_cache.file_hash(str(tmp_path / 'style.css'))}"
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.max_age == http_cache.ASSET_MAX_AGE and response.cache_control.immutable
+    assert client.get("/assets/style.css?m=old").cache_control.no_cache
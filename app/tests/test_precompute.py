@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+import aggregate
+import data
+import precompute
+
+FIGURE = json.dumps({"data": [], "layout": {"title": "whd"}})
+
+
+@pytest.fixture
+def artifact(tmp_path, monkeypatch):
+    source = tmp_path / "WHD.csv"
+    source.write_text("Country,Score\nNepal,5\n")
+    monkeypatch.setattr(data, "SOURCES", {"whd": [str(source)]})
+    path = precompute.write_artifact({"whd": [FIGURE]}, data.SOURCES, str(tmp_path / "figures.json.gz"))
+    precompute.load_artifact.cache_clear()
+    yield path, source
+    precompute.load_artifact.cache_clear()
+
+
+def test_artifact_round_trip(artifact):
+    path, _ = artifact
+    assert precompute.load_artifact(path) == {"whd": [json.loads(FIGURE)]}
+
+
+def test_changed_source_makes_it_stale(artifact):
+    path, source = artifact
+    source.write_text("Country,Score\nNepal,6\n")
+    assert precompute.load_artifact(path) is None
+
+
+def test_changed_settings_make_it_stale(artifact, monkeypatch):
+    path, _ = artifact
+    monkeypatch.setattr(aggregate, "AGGREGATE_ROWS", aggregate.AGGREGATE_ROWS + 1)
+    assert precompute.load_artifact(path) is None
+
+
+def test_missing_or_off(tmp_path):
+    assert precompute.load_artifact(str(tmp_path / "nothing.json.gz")) is None
+    assert precompute.load_artifact("off") is None
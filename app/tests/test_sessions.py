@@ -0,0 +1,88 @@
+import pytest
+
+import sessions
+
+DATASETS = ["mxmh", "whd15", "whd"]
+
+
+class FakeRedis:
+    """
+    The part of a redis client RedisStore uses, with a clock the tests move forward by hand
+    """
+
+    def __init__(self):
+        self.now = 0
+        self.values = {}  # key -> (bytes, when it expires)
+
+    def get(self, key):
+        value, expires = self.values.get(key, (None, None))
+        if value is None or expires <= self.now:
+            self.values.pop(key, None)
+            return None
+        return value
+
+    def setex(self, key, ttl, value):
+        self.values[key] = (value.encode(), self.now + ttl)
+
+    def expire(self, key, ttl):
+        if key in self.values:
+            self.values[key] = (self.values[key][0], self.now + ttl)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(sessions, "store", sessions.RedisStore(client, ttl=60))
+    return client
+
+
+def test_redis_store_round_trip():
+    client = FakeRedis()
+    store = sessions.RedisStore(client, ttl=60)
+    store.set("session:a", "hello")
+    assert client.values["session:a"] == (b"hello", 60)
+    assert store.get("session:a") == "hello"
+    assert store.get("session:b") is None
+
+
+def test_redis_store_expires():
+    client = FakeRedis()
+    store = sessions.RedisStore(client, ttl=60)
+    store.set("session:a", "hello")
+    client.now = 50
+    # reading it keeps it for another ttl
+    assert store.get("session:a") == "hello"
+    client.now = 100
+    assert store.get("session:a") == "hello"
+    client.now = 200
+    assert store.get("session:a") is None
+
+
+def test_remember_and_last_view(redis):
+    view = {"dataset": "mxmh", "filters": {"Fav genre": ["Rock"], "Age": [18, 30]}}
+    sessions.remember("abc", view)
+    assert sessions.last_view("abc") == view
+
+
+def test_unknown_or_expired_session(redis):
+    assert sessions.last_view(None) is None
+    assert sessions.last_view("nobody") is None
+    sessions.remember("abc", {"dataset": "whd", "filters": {}})
+    redis.now = 61
+    assert sessions.last_view("abc") is None
+
+
+def test_view_query_round_trip():
+    view = {"dataset": "mxmh", "filters": {"Fav genre": ["Rock", "Hip hop"], "Music effects": ["Improve"],
+                                           "Primary streaming service": ["Spotify"], "Age": [18, 30]}}
+    query = sessions.view_query(view)
+    assert query.startswith("?dataset=mxmh&")
+    assert sessions.view_from_query(query, DATASETS) == view
+
+
+def test_view_from_query_ignores_the_unknown():
+    assert sessions.view_from_query("", DATASETS) is None
+    assert sessions.view_from_query("?dataset=whd42", DATASETS) is None
+    # filters only apply to the music survey, and a broken age range is left out
+    assert sessions.view_from_query("?dataset=whd15&genre=Rock", DATASETS) == {"dataset": "whd15", "filters": {}}
+    assert sessions.view_from_query("?dataset=mxmh&age=young", DATASETS) == {"dataset": "mxmh", "filters": {}}
@@ -0,0 +1,77 @@
+import json
+import time
+
+import pytest
+
+import startup
+from benchmarks import importtime
+
+
+def call(app, path):
+    """
+    Send one request to a WSGI app, returning (status code, json body)
+    """
+    answer = {}
+
+    def start_response(status, headers):
+        answer["code"] = int(status.split()[0])
+
+    body = b"".join(app({"PATH_INFO": path, "REQUEST_METHOD": "GET"}, start_response))
+    return answer["code"], json.loads(body)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("name", importtime.BUDGETS)
+def test_import_time_budget(name):
+    module, env, budget = importtime.BUDGETS[name]
+    # the best of a few runs, so one slow run on a busy machine doesn't fail it
+    seconds = min(importtime.import_times(module, env)[module][1] for _ in range(3))
+    assert seconds <= budget, f"importing {module} took {seconds:.3f}s, the budget is {budget:.3f}s"
+
+
+def test_warm_up_failure_is_reported(monkeypatch):
+    monkeypatch.setattr(startup, "failure", None)
+    monkeypatch.setattr(startup, "ready", startup.threading.Event())
+
+    def warm_up():
+        raise OSError("no such file: WHD.csv")
+
+    app = startup.BackgroundApp(lambda: (lambda environ, start_response: []), warm_up)
+    wait_for(lambda: startup.failure is not None)
+    code, body = call(app, startup.READY_PATH)
+    assert code == 503
+    assert body["ready"] is False
+    assert "no such file: WHD.csv" in body["error"]
+
+
+def test_load_failure_is_reported(monkeypatch):
+    monkeypatch.setattr(startup, "failure", None)
+    monkeypatch.setattr(startup, "ready", startup.threading.Event())
+
+    def load():
+        raise ImportError("no module named dash")
+
+    app = startup.BackgroundApp(load)
+    wait_for(app.loaded.is_set)
+    assert call(app, "/")[0] == 500
+    code, body = call(app, startup.READY_PATH)
+    assert code == 503
+    assert "no module named dash" in body["error"]
+
+
+def test_ready_once_warmed_up(monkeypatch):
+    monkeypatch.setattr(startup, "failure", None)
+    monkeypatch.setattr(startup, "ready", startup.threading.Event())
+
+    app = startup.BackgroundApp(lambda: (lambda environ, start_response: []), lambda: None)
+    wait_for(startup.ready.is_set)
+    code, body = call(app, startup.READY_PATH)
+    assert code == 200
+    assert "error" not in body
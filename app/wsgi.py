@@ -0,0 +1,48 @@
+# production entry point for the app, run it from the app folder with:
+#     gunicorn -c gunicorn.conf.py wsgi:server
+# with the default STARTUP=preload (see startup.py), gunicorn.conf.py turns on preload_app, so this file is
+# imported once in the main gunicorn process before it forks its workers. everything loaded here (the data,
+# every dataset's figures) is then shared by all the workers through copy-on-write memory instead of being
+# loaded again by each one
+# with STARTUP=background each worker imports this file itself and starts listening straight away,
+# the app is imported and warmed up on a background thread
+import gc
+
+import startup
+
+
+def load():
+    from appv1 import app
+
+    return app.server
+
+
+def warm_up_worker():
+    import data_watch
+    from appv1 import warm_up
+
+    warm_up()
+    # every worker watches the csv files itself, see data_watch.py
+    data_watch.start()
+
+
+if startup.STARTUP == "background":
+    server = startup.BackgroundApp(load, warm_up_worker)
+else:
+    import data_sources
+    import figure_pool
+    from appv1 import app, warm_up
+
+    warm_up()
+    startup.ready.set()
+
+    # the figure pool's processes and the loading threads were only needed for warming up, and a fork copies
+    # neither processes nor threads, so stop them before gunicorn forks the workers (they start their own if needed)
+    figure_pool.shutdown(forkserver=True)
+    data_sources.shutdown()
+
+    # move everything loaded so far out of the garbage collector's sight, otherwise its bookkeeping writes
+    # would touch (and so copy) the shared pages in every worker
+    gc.freeze()
+
+    server = app.server